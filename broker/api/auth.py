@@ -19,8 +19,10 @@ from broker.config.settings import get_env
 
 logger = logging.getLogger("session-broker")
 
-# Endpoints that do not require authentication (use Flask endpoint names)
-PUBLIC_ENDPOINTS: set[str] = {"api.health"}
+# Endpoints that do not require authentication (use Flask endpoint names).
+# container_ready carries its own per-session token instead of the API key:
+# spawned containers must be able to call it without holding broker creds.
+PUBLIC_ENDPOINTS: set[str] = {"api.health", "api.container_ready"}
 
 
 def _get_api_key() -> str | None:
@@ -24,7 +24,7 @@ from broker.api.audit import audit_log_response
 from broker.container import get_services
 from broker.domain.session import SessionStore
 from broker.domain.user_profile import UserProfile
-from broker.domain.container import destroy_container
+from broker.domain.container import destroy_container, signal_container_ready
 from broker.domain.group_config import group_config
 from broker.services.provisioning import provision_user_connection
 
@@ -106,6 +106,44 @@ def health() -> RouteResponse:
     }), code
 
 
+@api.route("/internal/ready", methods=["POST"])
+@limiter.exempt
+def container_ready() -> RouteResponse:
+    """Readiness webhook posted by VNC containers on boot.
+
+    Authenticated by a per-session token (the container's VNC password,
+    already present in its spawn environment) rather than the API key.
+    ---
+    tags:
+      - Health
+    parameters:
+      - in: body
+        name: body
+        schema:
+          type: object
+          properties:
+            session_id:
+              type: string
+            token:
+              type: string
+    responses:
+      200:
+        description: Readiness recorded.
+      400:
+        description: Missing session_id or token.
+      404:
+        description: No spawn in flight for this session (or bad token).
+    """
+    data = request.get_json(silent=True) or {}
+    session_id = data.get("session_id")
+    token = data.get("token")
+    if not session_id or not token:
+        return api_error("session_id and token required", 400)
+    if not signal_container_ready(str(session_id), str(token)):
+        return api_error("unknown session", 404)
+    return api_success({"session_id": session_id})
+
+
 @api.route("/api/secrets/status")
 def secrets_status() -> RouteResponse:
     """Get secrets provider status.
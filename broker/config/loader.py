@@ -30,6 +30,9 @@ class BrokerConfig:
     _typed_config: BrokerSettings | None = None
     _last_load: float = 0
     _cache_duration: int = 60
+    _settings_checked: float = 0
+    _settings_ttl: float = 1.0
+    _browser_type: str | None = None
 
     @classmethod
     def load(cls) -> dict:
@@ -48,17 +51,18 @@ class BrokerConfig:
     @classmethod
     def _load_locked(cls, now: float) -> dict:
         """Load config while holding ``_lock``. Called from :meth:`load`."""
+        # Config is being (re)loaded: derived values must be recomputed
+        cls._browser_type = None
         # Default configuration
         defaults = {
             "sync": {"interval": 60, "ignored_users": ["guacadmin"], "sync_config_on_restart": False},
             "orchestrator": {
                 "backend": "docker",
-                "docker": {
-                    "network": "guacamole_vnc-network"
-                },
+                "docker": {"network": "guacamole_vnc-network"},
                 "kubernetes": {
                     "namespace": "guacamole",
                     "service_account": "",
+                    "connection_pool_maxsize": 64,
                     "labels": {
                         "app": "vnc-session",
                         "managed-by": "guacamole-broker"
@@ -174,9 +178,16 @@ class BrokerConfig:
 
     @classmethod
     def settings(cls) -> BrokerSettings:
-        """Get typed configuration as a BrokerSettings instance."""
-        if cls._typed_config is None:
+        """
+        Get typed configuration as a BrokerSettings instance.
+
+        The validated model is cached; :meth:`load` is only consulted at most
+        once per ``_settings_ttl`` seconds so hot callers pay a pointer load.
+        """
+        now = time.monotonic()
+        if cls._typed_config is None or (now - cls._settings_checked) > cls._settings_ttl:
             cls.load()
+            cls._settings_checked = now
         assert cls._typed_config is not None
         return cls._typed_config
 
@@ -185,20 +196,29 @@ class BrokerConfig:
         """
         Detect browser type from the container image name.
 
+        The result is cached on the class and invalidated whenever the
+        config file is reloaded, so hot callers skip the string scans.
+
         Returns:
             'firefox' or 'chromium'
         """
+        if cls._browser_type is not None:
+            return cls._browser_type
+
         image = str(cls.get("containers", "image", default=""))
         image_lower = image.lower()
 
         if "firefox" in image_lower:
-            return "firefox"
+            browser_type = "firefox"
         elif "chromium" in image_lower or "chrome" in image_lower:
-            return "chromium"
+            browser_type = "chromium"
         else:
             # Default to chromium if not detected
             logger.warning(f"Could not detect browser type from image '{image}', defaulting to chromium")
-            return "chromium"
+            browser_type = "chromium"
+
+        cls._browser_type = browser_type
+        return browser_type
 
 
 class ProfilesConfig:
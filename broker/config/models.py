@@ -50,6 +50,7 @@ class KubernetesOrchestratorConfig(BaseModel):
 
     namespace: str = "guacamole"
     service_account: str = ""
+    connection_pool_maxsize: int = 64
     labels: dict[str, str] = {"app": "vnc-session", "managed-by": "guacamole-broker"}
     image_pull_policy: str = "IfNotPresent"
     image_pull_secrets: list[str] = []
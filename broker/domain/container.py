@@ -7,9 +7,11 @@ This module provides a facade over the container orchestration backends
 
 from __future__ import annotations
 
+import hmac
 import logging
 import secrets
 import socket
+import threading
 import time
 
 from broker.config.settings import VNC_PORT, VNC_CONTAINER_TIMEOUT, VNC_PASSWORD_LENGTH
@@ -17,6 +19,53 @@ from broker.domain.orchestrator import get_orchestrator
 
 logger = logging.getLogger("session-broker")
 
+# Readiness events posted by VNC containers to /internal/ready, keyed by
+# session_id and guarded by a per-session token (the container's VNC
+# password, which the spawn env already carries). Entries are registered
+# just before a spawn and removed when wait_for_vnc finishes, so the map
+# is bounded by in-flight spawns and unknown session ids are rejected.
+_ready_lock = threading.Lock()
+_ready_events: dict[str, tuple[threading.Event, str]] = {}
+
+
+def register_ready_signal(session_id: str, token: str) -> None:
+    """Register a pending readiness signal for a spawning container."""
+    with _ready_lock:
+        _ready_events[session_id] = (threading.Event(), token)
+
+
+def discard_ready_signal(session_id: str) -> None:
+    """Drop a pending readiness registration (spawn failed or finished)."""
+    with _ready_lock:
+        _ready_events.pop(session_id, None)
+
+
+def _peek_ready_event(session_id: str) -> threading.Event | None:
+    """Return the registered readiness event for a session, if any."""
+    with _ready_lock:
+        entry = _ready_events.get(session_id)
+        return entry[0] if entry else None
+
+
+def signal_container_ready(session_id: str, token: str) -> bool:
+    """
+    Mark a container as ready (called by the /internal/ready webhook).
+
+    Args:
+        session_id: Session identifier reported by the container
+        token: Per-session token proving the caller is that container
+
+    Returns:
+        True if a matching registration existed and was signalled
+    """
+    with _ready_lock:
+        entry = _ready_events.get(session_id)
+    if entry is None or not hmac.compare_digest(entry[1], token):
+        return False
+    entry[0].set()
+    logger.info(f"Container for session {session_id} reported ready")
+    return True
+
 
 def generate_vnc_password() -> str:
     """
@@ -40,7 +89,14 @@ def spawn_vnc_container(session_id: str, username: str | None, vnc_password: str
     Returns:
         Tuple of (container_id, container_ip)
     """
-    info = get_orchestrator().spawn_container(session_id, username, vnc_password)
+    # Register before the spawn so the container can't report in ahead of
+    # us; wait_for_vnc removes the entry when the wait finishes
+    register_ready_signal(session_id, vnc_password)
+    try:
+        info = get_orchestrator().spawn_container(session_id, username, vnc_password)
+    except Exception:
+        discard_ready_signal(session_id)
+        raise
     return info.container_id, info.container_ip
 
 
@@ -81,26 +137,64 @@ def destroy_container(container_id: str) -> None:
     get_orchestrator().destroy_container(container_id)
 
 
-def wait_for_vnc(host: str, port: int = VNC_PORT, timeout: int = VNC_CONTAINER_TIMEOUT) -> bool:
+def wait_for_vnc(
+    host: str,
+    port: int = VNC_PORT,
+    timeout: int = VNC_CONTAINER_TIMEOUT,
+    session_id: str | None = None,
+) -> bool:
     """
     Wait for VNC server to be available.
 
+    If a session_id is given and the container's boot script POSTs the
+    /internal/ready webhook, the wait returns as soon as that signal
+    arrives; socket probing remains the fallback for images without it.
+
     Args:
         host: VNC host
         port: VNC port
         timeout: Timeout in seconds
+        session_id: Optional session identifier to watch for the webhook
 
     Returns:
         True if VNC is available, False on timeout
     """
-    start = time.time()
-    while time.time() - start < timeout:
-        try:
-            with socket.create_connection((host, port), timeout=1):
+    event = _peek_ready_event(session_id) if session_id else None
+    try:
+        start = time.time()
+        while time.time() - start < timeout:
+            if event is not None and event.is_set():
                 return True
-        except (socket.timeout, ConnectionRefusedError, OSError):
-            time.sleep(0.5)
-    return False
+            try:
+                with socket.create_connection((host, port), timeout=1):
+                    return True
+            except (socket.timeout, ConnectionRefusedError, OSError):
+                if event is not None:
+                    if event.wait(0.5):
+                        return True
+                else:
+                    time.sleep(0.5)
+        return False
+    finally:
+        if session_id:
+            discard_ready_signal(session_id)
+
+
+def get_running_container_ids() -> set[str]:
+    """
+    Get the IDs of all running managed containers/pods with a single list call.
+
+    Prefer this over calling is_container_running() in a loop: it replaces
+    N status lookups with one backend list request.
+
+    Returns:
+        Set of container IDs / pod names currently running
+    """
+    return {
+        c["id"]
+        for c in get_orchestrator().list_managed_containers()
+        if c.get("status") == "running"
+    }
 
 
 def is_container_running(container_id: str) -> bool:
@@ -7,6 +7,7 @@ from __future__ import annotations
 import logging
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Any, Callable
 
 import requests
@@ -36,11 +37,17 @@ class GuacamoleAPI:
             circuit_breaker: Optional pre-built CircuitBreaker (defaults to a new one)
         """
         self.base_url = base_url.rstrip("/")
+        self._api_base = f"{self.base_url}/api"
+        self._session_base = f"{self._api_base}/session/data/postgresql"
         self.username = username
         self.password = password
         self.token: str | None = None
         self.token_expires: float = 0
         self.data_source = "postgresql"
+        self._data_source_resolved = False
+        # Last-known connection bodies, keyed by identifier, so updates can
+        # skip re-fetching connections this client created itself.
+        self._conn_cache: dict[str, dict] = {}
         self._lock = threading.Lock()
         self._circuit = circuit_breaker or CircuitBreaker(name="guacamole")
 
@@ -62,7 +69,7 @@ class GuacamoleAPI:
         """
         resp = self._request(
             requests.post,
-            f"{self.base_url}/api/tokens",
+            f"{self._api_base}/tokens",
             data={"username": self.username, "password": self.password},
             timeout=10,
         )
@@ -71,7 +78,14 @@ class GuacamoleAPI:
         self.token = data["authToken"]
         # Token valid for ~1 hour, refresh at 58 minutes
         self.token_expires = time.time() + 3500
-        self.data_source = list(data.get("availableDataSources", ["postgresql"]))[0]
+        # The data source never changes across token refreshes, so resolve it
+        # once on first auth and avoid re-parsing the list on every refresh.
+        if not self._data_source_resolved:
+            self.data_source = next(
+                iter(data.get("availableDataSources") or ("postgresql",)), "postgresql"
+            )
+            self._data_source_resolved = True
+            self._session_base = f"{self._api_base}/session/data/{self.data_source}"
         return self.token
 
     def _get_auth_params(self) -> tuple[str, str]:
@@ -111,8 +125,8 @@ class GuacamoleAPI:
             Response object
         """
         for attempt in range(2):
-            token, ds = self._get_auth_params()
-            url = f"{self.base_url}/api/session/data/{ds}/{path}"
+            token, _ = self._get_auth_params()
+            url = f"{self._session_base}/{path}"
             resp = self._request(
                 method, url, params={"token": token}, timeout=timeout, **kwargs
             )
@@ -152,6 +166,36 @@ class GuacamoleAPI:
         resp = self._do_request(requests.get, f"users/{username}/userGroups")
         return resp.json()
 
+    def get_users_with_groups(self, usernames: list) -> dict:
+        """
+        Get groups for several users in parallel.
+
+        Guacamole has no bulk group-expansion endpoint, so the per-user
+        lookups fan out over a small thread pool instead of one
+        sequential round-trip per user.
+
+        Args:
+            usernames: Usernames to look up
+
+        Returns:
+            Dictionary of username -> list of group names; users whose
+            lookup failed are absent
+        """
+        result: dict = {}
+        if not usernames:
+            return result
+        with ThreadPoolExecutor(
+            max_workers=min(8, len(usernames)), thread_name_prefix="guac-groups"
+        ) as executor:
+            futures = {executor.submit(self.get_user_groups, u): u for u in usernames}
+            for future in as_completed(futures):
+                username = futures[future]
+                try:
+                    result[username] = future.result()
+                except Exception as e:
+                    logger.warning(f"Group lookup failed for {username}: {e}")
+        return result
+
     def get_all_user_groups(self) -> dict:
         """
         Get all user groups in Guacamole.
@@ -212,7 +256,9 @@ class GuacamoleAPI:
             "attributes": {"max-connections": "1", "max-connections-per-user": "1"}
         }
         resp = self._do_request(requests.post, "connections", json=connection_data)
-        return resp.json()["identifier"]
+        conn_id = resp.json()["identifier"]
+        self._conn_cache[conn_id] = connection_data
+        return conn_id
 
     def update_connection(self, conn_id: str, hostname: str, port: int, password: str) -> None:
         """
@@ -224,13 +270,19 @@ class GuacamoleAPI:
             port: VNC port
             password: VNC password
         """
-        # Get connection details
-        resp = self._do_request(requests.get, f"connections/{conn_id}")
-        connection = resp.json()
+        connection = self._conn_cache.get(conn_id)
+        if connection is not None:
+            # We created this connection, so the cached body (including its
+            # parameters) is authoritative — no GET round-trips needed.
+            parameters = connection.get("parameters", {})
+        else:
+            # Get connection details
+            resp = self._do_request(requests.get, f"connections/{conn_id}")
+            connection = resp.json()
 
-        # Get existing parameters separately
-        params_resp = self._do_request(requests.get, f"connections/{conn_id}/parameters")
-        parameters = params_resp.json()
+            # Get existing parameters separately
+            params_resp = self._do_request(requests.get, f"connections/{conn_id}/parameters")
+            parameters = params_resp.json()
 
         # Update parameters
         parameters.update({
@@ -241,6 +293,7 @@ class GuacamoleAPI:
         connection["parameters"] = parameters
 
         self._do_request(requests.put, f"connections/{conn_id}", json=connection)
+        self._conn_cache[conn_id] = connection
 
     def sync_connection_config(self, conn_id: str, username: str = "") -> bool:
         """
@@ -306,6 +359,7 @@ class GuacamoleAPI:
             self._do_request(
                 requests.put, f"connections/{conn_id}", json=connection
             )
+            self._conn_cache[conn_id] = connection
             logger.info(f"Synced config for connection {conn_id} (user: {username})")
             return True
 
@@ -322,6 +376,7 @@ class GuacamoleAPI:
         Args:
             conn_id: Connection identifier
         """
+        self._conn_cache.pop(conn_id, None)
         self._do_request(
             requests.delete, f"connections/{conn_id}", raise_for_status=False
         )
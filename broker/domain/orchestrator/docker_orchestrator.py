@@ -2,38 +2,144 @@
 Docker implementation of container orchestration.
 """
 
+import functools
 import logging
 import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 
 import docker
 import docker.errors
 import docker.types
 
 from broker.config.loader import BrokerConfig
+from broker.config.settings import get_env
 from broker.domain.orchestrator.base import ContainerInfo
+from broker.resilience import Singleflight
 
 logger = logging.getLogger("session-broker")
 
+# Shared worker pool for background container teardown; stop(timeout=10)
+# can block for seconds and must not sit on the request path.
+_destroy_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="docker-destroy")
+
+# Overlaps browser-policy file writes with the container create RPC.
+_policy_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="policy-write")
+
+# List-response states and event statuses that mean "container is up"
+_RUNNING_STATUSES = frozenset({"running", "start", "restart", "unpause"})
+
+
+@functools.lru_cache(maxsize=1)
+def _shared_docker_client() -> docker.DockerClient:
+    """Build the process-wide Docker client (socket + version negotiation).
+
+    Cached so that repeated orchestrator construction (tests, resets) reuses
+    one client instead of opening a new Unix socket each time. Cleared by
+    ``reset_orchestrator``.
+
+    The socket timeout is deliberately long: slow container creation on a
+    loaded daemon must not surface as a spurious client-side timeout that
+    aborts an in-flight spawn. Tunable via ``DOCKER_API_TIMEOUT``.
+    """
+    return docker.from_env(timeout=int(os.environ.get("DOCKER_API_TIMEOUT", "600")))
+
 
 class DockerOrchestrator:
     """Docker-based container orchestrator."""
 
     def __init__(self) -> None:
-        """Initialize Docker client."""
-        self._client = docker.from_env()
+        """Initialize Docker client (shared across instances)."""
+        self._client = _shared_docker_client()
+        self._network_name: str | None = None
+        # Short-TTL cache so polling loops don't hammer the daemon with
+        # identical inspect calls (id -> (monotonic timestamp, running))
+        self._status_cache: dict[str, tuple[float, bool]] = {}
+        self._status_ttl = 1.5
+        # Deduplicate concurrent read RPCs so N parallel callers cost 1 call
+        self._singleflight = Singleflight()
+        # Request-scoped list cache: dashboard-style calls hit several read
+        # methods back to back; one bulk list RPC feeds all of them
+        # (running_only -> (monotonic timestamp, raw list response))
+        self._list_cache: dict[bool, tuple[float, list[dict]]] = {}
+        self._list_cache_ttl = 0.5
+        # Container IPs are fixed for the container's lifetime; remember them
+        # at spawn so pool listing needs no network parsing per entry
+        # (id -> (ip, session_id))
+        self._ip_cache: dict[str, tuple[str, str]] = {}
+        # The user-data mount is fixed for the process lifetime, so the Mount
+        # object is built once; image/memory/shm come from the hot-reloadable
+        # config and are re-read per spawn (see _run_defaults)
+        user_profiles_volume = os.environ.get(
+            "USER_PROFILES_VOLUME", "guacamole_user_profiles"
+        )
+        self._base_mount = docker.types.Mount(
+            target="/user-data",
+            source=user_profiles_volume,
+            type="volume",
+            read_only=False,
+        )
+        # Event-driven state table: one long-lived events() stream replaces
+        # repeated inspect polling (id -> last known status)
+        self._state: dict[str, str] = {}
+        self._events_ready = False
+        threading.Thread(
+            target=self._event_loop, name="docker-events", daemon=True
+        ).start()
 
     @property
     def client(self) -> docker.DockerClient:
         """Get the Docker client."""
         return self._client
 
+    def _event_loop(self) -> None:
+        """
+        Maintain the container state table from the Docker event stream.
+
+        Bootstraps once from a bulk list, then applies start/die/destroy
+        events as they arrive. Runs in a daemon thread; on stream errors it
+        resets the table (falling back to inspect) and resubscribes.
+        """
+        while True:
+            try:
+                for container in self._client.api.containers(
+                    all=True, filters={"label": "guac.managed=true"}
+                ):
+                    self._state[container["Id"]] = container.get("State", "")
+                self._events_ready = True
+
+                for event in self._client.events(
+                    filters={"label": "guac.managed=true", "type": "container"},
+                    decode=True,
+                ):
+                    status = event.get("status")
+                    container_id = event.get("id")
+                    if not status or not container_id:
+                        continue
+                    if status == "destroy":
+                        self._state.pop(container_id, None)
+                    else:
+                        self._state[container_id] = status
+            except Exception as e:
+                self._events_ready = False
+                self._state.clear()
+                logger.warning(f"Docker event stream error, resubscribing: {e}")
+                time.sleep(2)
+
     def _get_network(self) -> str:
         """
         Get or create Docker network for VNC containers.
 
+        The result is memoized: the network name and its existence do not
+        change at runtime, so the daemon round-trip is only paid once.
+
         Returns:
             Network name
         """
+        if self._network_name:
+            return self._network_name
+
         settings = BrokerConfig.settings()
         network_name = settings.orchestrator.docker.network or settings.containers.network
         try:
@@ -41,8 +147,26 @@ class DockerOrchestrator:
         except docker.errors.NotFound:
             logger.info(f"Creating network {network_name}")
             self._client.networks.create(network_name, driver="bridge")
+        self._network_name = network_name
         return network_name
 
+    def _run_defaults(self) -> dict:
+        """Session-independent containers.run kwargs.
+
+        image, mem_limit and shm_size are read from settings on every call
+        so a config hot-reload takes effect on the next spawn; only the
+        Mount object (fixed for the process lifetime) is reused.
+        """
+        containers_cfg = BrokerConfig.settings().containers
+        return {
+            "image": containers_cfg.image,
+            "detach": True,
+            "mounts": [self._base_mount],
+            "mem_limit": containers_cfg.memory_limit,
+            "shm_size": containers_cfg.shm_size,
+            "auto_remove": False,
+        }
+
     def spawn_container(
         self, session_id: str, username: str | None, vnc_password: str
     ) -> ContainerInfo:
@@ -58,13 +182,6 @@ class DockerOrchestrator:
             ContainerInfo with container details
         """
         container_name = f"vnc-{session_id}"
-
-        # Get container settings from config
-        containers_cfg = BrokerConfig.settings().containers
-        vnc_image = containers_cfg.image
-        mem_limit = containers_cfg.memory_limit
-        shm_size = containers_cfg.shm_size
-
         vnc_network = self._get_network()
 
         # For pool containers (no username), use default config
@@ -74,13 +191,21 @@ class DockerOrchestrator:
             "VNC_RESOLUTION": "1920x1080",
             "VNC_COL_DEPTH": "24",
             "STARTING_URL": homepage,
+            "SESSION_ID": session_id,
         }
+        # Images that support it POST {session_id, token} here on boot
+        # (token is the VNC password); wait_for_vnc then returns without
+        # waiting for the next socket probe
+        ready_url = get_env("ready_callback_url")
+        if ready_url:
+            environment["BROKER_READY_URL"] = ready_url
         labels = {
             "guac.session.id": session_id,
             "guac.managed": "true",
             "guac.pool": "true" if not username else "false",
         }
 
+        policy_future: Future | None = None
         if username:
             # Import here to avoid circular imports
             from broker.domain.user_profile import UserProfile
@@ -94,10 +219,14 @@ class DockerOrchestrator:
             # Detect browser type from image name
             browser = BrokerConfig.get_browser_type()
 
-            # Apply browser policies (bookmarks, homepage, autofill)
-            UserProfile.set_browser_policies(username, bookmarks, homepage, autofill)
+            # Write browser policies (bookmarks, homepage, autofill) in the
+            # background so the file I/O overlaps the container create RPC;
+            # joined below before the container becomes reachable.
+            policy_future = _policy_executor.submit(
+                UserProfile.set_browser_policies, username, bookmarks, homepage, autofill
+            )
             logger.info(
-                f"Applied {browser} policies for {username}: "
+                f"Applying {browser} policies for {username}: "
                 f"{len(bookmarks)} bookmarks, homepage={homepage}"
             )
 
@@ -105,54 +234,82 @@ class DockerOrchestrator:
             environment["GUAC_USERNAME"] = username
             labels["guac.username"] = username
 
-        # Build volume mounts using Docker volume name for user data
-        user_profiles_volume = os.environ.get(
-            "USER_PROFILES_VOLUME", "guacamole_user_profiles"
-        )
-        mounts = [
-            docker.types.Mount(
-                target="/user-data",
-                source=user_profiles_volume,
-                type="volume",
-                read_only=False,
-            ),
-        ]
-
         container = self._client.containers.run(
-            vnc_image,
+            **self._run_defaults(),
             name=container_name,
-            detach=True,
             environment=environment,
-            mounts=mounts,
             labels=labels,
-            mem_limit=mem_limit,
-            shm_size=shm_size,
-            auto_remove=False,
             network=vnc_network,
         )
 
-        # Wait for container to get IP
-        container.reload()
-        container_ip = container.attrs["NetworkSettings"]["Networks"][vnc_network][
-            "IPAddress"
-        ]
+        container_ip = self._get_container_ip(container, vnc_network)
+
+        # Policies must be on disk before the browser inside the container
+        # starts reading them; by now the write has had the whole create RPC
+        # to complete, so this is almost always a no-op.
+        if policy_future is not None:
+            policy_future.result(timeout=5)
+
+        if container_ip:
+            self._ip_cache[container.id] = (container_ip, session_id)
 
         logger.info(f"Container {container_name} started with IP {container_ip}")
         return ContainerInfo(
             container_id=container.id, container_ip=container_ip, backend="docker"
         )
 
+    @staticmethod
+    def _get_container_ip(
+        container: docker.models.containers.Container, network: str
+    ) -> str:
+        """
+        Get a container's IP on the given network without a gratuitous reload.
+
+        ``containers.run(detach=True)`` already returns populated attrs; the
+        IP is usually present immediately on bridge networks. Only when it
+        is missing do we re-inspect, with a short backoff.
+
+        Args:
+            container: Container object from the run/list call
+            network: Docker network name
+
+        Returns:
+            Container IP address (empty string if never assigned)
+        """
+        def _ip_from_attrs() -> str:
+            networks = container.attrs.get("NetworkSettings", {}).get("Networks", {})
+            return networks.get(network, {}).get("IPAddress", "")
+
+        container_ip = _ip_from_attrs()
+        for delay in (0.02, 0.05, 0.1, 0.2):
+            if container_ip:
+                break
+            time.sleep(delay)
+            container.reload()
+            container_ip = _ip_from_attrs()
+        return container_ip
+
     def destroy_container(self, container_id: str) -> None:
         """
         Destroy a VNC container.
 
+        The stop+remove is dispatched to a background worker so callers
+        (session teardown, cleanup loops) return immediately instead of
+        blocking up to 10 s on a graceful stop.
+
         Args:
             container_id: Docker container ID
         """
+        self._status_cache.pop(container_id, None)
+        self._ip_cache.pop(container_id, None)
+        _destroy_executor.submit(self._destroy_blocking, container_id)
+
+    def _destroy_blocking(self, container_id: str) -> None:
+        """Remove a container synchronously (worker thread)."""
         try:
-            container = self._client.containers.get(container_id)
-            container.stop(timeout=10)
-            container.remove()
+            # Force-remove collapses lookup + stop + remove into one daemon
+            # transaction (DELETE /containers/{id}?force=1&v=1)
+            self._client.api.remove_container(container_id, v=True, force=True)
             logger.info(f"Container {container_id[:12]} destroyed")
         except docker.errors.NotFound:
             pass
@@ -169,14 +326,26 @@ class DockerOrchestrator:
         Returns:
             True if running, False otherwise
         """
+        # Event stream answers from memory with zero RPCs once bootstrapped
+        if self._events_ready:
+            status = self._state.get(container_id)
+            if status is not None:
+                return status in _RUNNING_STATUSES
+
+        cached = self._status_cache.get(container_id)
+        if cached is not None and time.monotonic() - cached[0] < self._status_ttl:
+            return cached[1]
+
         try:
-            container = self._client.containers.get(container_id)
-            return bool(container.status == "running")
+            inspect = self._client.api.inspect_container(container_id)
+            running = bool(inspect.get("State", {}).get("Running", False))
         except docker.errors.NotFound:
-            return False
+            running = False
         except Exception as e:
             logger.warning(f"Error checking container status: {e}")
             return False
+        self._status_cache[container_id] = (time.monotonic(), running)
+        return running
 
     def get_running_count(self) -> int:
         """
@@ -185,11 +354,33 @@ class DockerOrchestrator:
         Returns:
             Number of running containers
         """
+        return self._singleflight.do("running_count", self._get_running_count)
+
+    def _list_managed(self, running_only: bool = False) -> list[dict]:
+        """
+        List managed containers as raw dicts, memoized for a short window.
+
+        Args:
+            running_only: Restrict to running containers
+
+        Returns:
+            Raw container dicts from the Docker list API
+        """
+        now = time.monotonic()
+        cached = self._list_cache.get(running_only)
+        if cached is not None and now - cached[0] < self._list_cache_ttl:
+            return cached[1]
+
+        filters: dict = {"label": "guac.managed=true"}
+        if running_only:
+            filters["status"] = "running"
+        raw = self._client.api.containers(all=not running_only, filters=filters)
+        self._list_cache[running_only] = (now, raw)
+        return raw
+
+    def _get_running_count(self) -> int:
         try:
-            containers = self._client.containers.list(
-                filters={"label": "guac.managed=true", "status": "running"}
-            )
-            return len(containers)
+            return len(self._list_managed(running_only=True))
         except Exception:
             return 0
 
@@ -200,24 +391,52 @@ class DockerOrchestrator:
         Returns:
             List of container info dictionaries
         """
+        return self._singleflight.do("list_managed", self._list_managed_containers)
+
+    def _list_managed_containers(self) -> list[dict]:
         result = []
         try:
-            containers = self._client.containers.list(
-                all=True, filters={"label": "guac.managed=true"}
-            )
+            # Low-level API: raw dicts straight from the list response, no
+            # Container model objects built per entry
+            containers = self._list_managed()
             for container in containers:
                 result.append(
                     {
-                        "id": container.id,
-                        "name": container.name,
-                        "status": container.status,
-                        "labels": container.labels,
+                        "id": container["Id"],
+                        "name": container["Names"][0].lstrip("/") if container.get("Names") else "",
+                        "status": container.get("State", ""),
+                        "labels": container.get("Labels") or {},
                     }
                 )
         except Exception as e:
             logger.error(f"Error listing containers: {e}")
         return result
 
+    @staticmethod
+    def _read_cgroup_memory(container_id: str) -> int | None:
+        """
+        Read a container's memory usage directly from its cgroup.
+
+        Args:
+            container_id: Docker container ID
+
+        Returns:
+            Memory usage in bytes, or None if the cgroup file is unavailable
+            (rootless Docker, non-Linux, cgroup driver mismatch)
+        """
+        # cgroup v2 (systemd driver), then cgroup v1 layout
+        candidates = (
+            f"/sys/fs/cgroup/system.slice/docker-{container_id}.scope/memory.current",
+            f"/sys/fs/cgroup/memory/docker/{container_id}/memory.usage_in_bytes",
+        )
+        for path in candidates:
+            try:
+                with open(path, "r") as f:
+                    return int(f.read())
+            except (OSError, ValueError):
+                continue
+        return None
+
     def get_containers_memory_gb(self) -> float:
         """
         Get total memory used by VNC containers in GB.
@@ -225,19 +444,27 @@ class DockerOrchestrator:
         Returns:
             Memory usage in GB
         """
+        def _memory_usage(container_id: str) -> int:
+            # Reading the cgroup file is microseconds; stats() is a full
+            # daemon round-trip, so keep it as fallback only.
+            usage = self._read_cgroup_memory(container_id)
+            if usage is not None:
+                return usage
+            try:
+                stats = self._client.api.stats(container_id, stream=False)
+                return int(stats.get("memory_stats", {}).get("usage", 0))
+            except Exception:
+                # Estimate 1GB per container if stats fail
+                return 1024 * 1024 * 1024
+
         try:
-            containers = self._client.containers.list(
-                filters={"label": "guac.managed=true", "status": "running"}
-            )
-            total_bytes = 0
-            for container in containers:
-                try:
-                    stats = container.stats(stream=False)
-                    mem_usage = stats.get("memory_stats", {}).get("usage", 0)
-                    total_bytes += mem_usage
-                except Exception:
-                    # Estimate 1GB per container if stats fail
-                    total_bytes += 1024 * 1024 * 1024
+            container_ids = [c["Id"] for c in self._list_managed(running_only=True)]
+            if not container_ids:
+                return 0.0
+            # Each stats call is a blocking daemon round-trip; fan out so total
+            # wall time is ~one round-trip instead of one per container.
+            with ThreadPoolExecutor(max_workers=min(8, len(container_ids))) as executor:
+                total_bytes = sum(executor.map(_memory_usage, container_ids))
             return total_bytes / 1024 / 1024 / 1024
         except Exception:
             return 0.0
@@ -249,26 +476,31 @@ class DockerOrchestrator:
         Returns:
             List of pool container info dictionaries
         """
+        return self._singleflight.do("pool_containers", self._get_pool_containers)
+
+    def _get_pool_containers(self) -> list[dict]:
         result = []
         try:
-            containers = self._client.containers.list(
-                filters={"label": ["guac.managed=true", "guac.pool=true"], "status": "running"}
-            )
+            containers = self._list_managed(running_only=True)
             for container in containers:
-                labels = container.labels or {}
-                # Only include if not yet claimed (no username label)
-                if "guac.username" not in labels:
-                    # Get container IP
-                    container.reload()
-                    networks = container.attrs.get("NetworkSettings", {}).get("Networks", {})
-                    container_ip = ""
-                    for net_info in networks.values():
-                        container_ip = net_info.get("IPAddress", "")
-                        if container_ip:
-                            break
+                labels = container.get("Labels") or {}
+                # Only include unclaimed pool containers (no username label)
+                if labels.get("guac.pool") == "true" and "guac.username" not in labels:
+                    cached = self._ip_cache.get(container["Id"])
+                    if cached is not None:
+                        container_ip = cached[0]
+                    else:
+                        # Network info is already in the bulk list response; a
+                        # per-container inspect would add one RPC per entry
+                        networks = container.get("NetworkSettings", {}).get("Networks", {})
+                        container_ip = ""
+                        for net_info in networks.values():
+                            container_ip = net_info.get("IPAddress", "")
+                            if container_ip:
+                                break
 
                     result.append({
-                        "id": container.id,
+                        "id": container["Id"],
                         "session_id": labels.get("guac.session.id", ""),
                         "ip": container_ip,
                     })
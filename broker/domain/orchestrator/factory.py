@@ -7,52 +7,48 @@ from __future__ import annotations
 import logging
 import threading
 
-from typing import Any
-
 from broker.config.loader import BrokerConfig
 from broker.domain.orchestrator.base import ContainerOrchestrator
 
 logger = logging.getLogger("session-broker")
 
-# Singleton instance
-_lock = threading.Lock()
-_orchestrator: Any = None
+_orchestrator: ContainerOrchestrator | None = None
+_orchestrator_lock = threading.Lock()
 
 
 def get_orchestrator() -> ContainerOrchestrator:
     """
     Get the configured container orchestrator.
 
-    Uses double-checked locking to ensure only one orchestrator instance
-    exists even when accessed concurrently from multiple threads.
+    Double-checked locking singleton: the fast path is a plain global read,
+    and the lock guarantees exactly one instance is ever constructed — the
+    orchestrators start background watch threads in __init__, so racing
+    initializations must not each build (and leak) one.
 
     Returns:
         ContainerOrchestrator instance (Docker or Kubernetes)
     """
     global _orchestrator
-
     if _orchestrator is not None:
         return _orchestrator
-
-    with _lock:
-        if _orchestrator is not None:
-            return _orchestrator
-
-        backend = BrokerConfig.settings().orchestrator.backend
-        logger.info(f"Initializing {backend} orchestrator")
-
-        if backend == "kubernetes":
-            from broker.domain.orchestrator.kubernetes_orchestrator import (
-                KubernetesOrchestrator,
-            )
-
-            _orchestrator = KubernetesOrchestrator()
-        else:
-            from broker.domain.orchestrator.docker_orchestrator import DockerOrchestrator
-
-            _orchestrator = DockerOrchestrator()
-
-    return _orchestrator
+    with _orchestrator_lock:
+        if _orchestrator is None:
+            backend = BrokerConfig.settings().orchestrator.backend
+            logger.info(f"Initializing {backend} orchestrator")
+
+            if backend == "kubernetes":
+                from broker.domain.orchestrator.kubernetes_orchestrator import (
+                    KubernetesOrchestrator,
+                )
+
+                _orchestrator = KubernetesOrchestrator()
+            else:
+                from broker.domain.orchestrator.docker_orchestrator import (
+                    DockerOrchestrator,
+                )
+
+                _orchestrator = DockerOrchestrator()
+        return _orchestrator
 
 
 def reset_orchestrator() -> None:
@@ -62,5 +58,9 @@ def reset_orchestrator() -> None:
     Useful for testing or configuration changes.
     """
     global _orchestrator
-    with _lock:
+    with _orchestrator_lock:
         _orchestrator = None
+
+    from broker.domain.orchestrator.docker_orchestrator import _shared_docker_client
+
+    _shared_docker_client.cache_clear()
@@ -5,17 +5,36 @@ Kubernetes implementation of container orchestration.
 from __future__ import annotations
 
 import logging
+import re
+import threading
 import time
-from typing import Any
+from typing import Any, Callable
 
 from broker.config.loader import BrokerConfig
+from broker.config.settings import get_env
 from broker.domain.orchestrator.base import ContainerInfo
 
 logger = logging.getLogger("session-broker")
 
+# Kubernetes memory quantity: number plus optional binary/decimal suffix.
+# The number part allows at most one decimal point so malformed strings
+# like "1.2.3" fall through to the 1Gi default instead of blowing up float()
+_MEM_RE = re.compile(r"^(\d+(?:\.\d+)?)([KMGT]i?)?$")
+_MEM_UNITS = {
+    None: 1,
+    "K": 1000,
+    "Ki": 1024,
+    "M": 1000**2,
+    "Mi": 1024**2,
+    "G": 1000**3,
+    "Gi": 1024**3,
+    "T": 1000**4,
+    "Ti": 1024**4,
+}
+
 # Kubernetes client is optional - only imported when backend is kubernetes
 try:
-    from kubernetes import client, config
+    from kubernetes import client, config, watch
     from kubernetes.client.rest import ApiException
 
     KUBERNETES_AVAILABLE = True
@@ -23,6 +42,7 @@ except ImportError:
     KUBERNETES_AVAILABLE = False
     client = None
     config = None
+    watch = None
     ApiException = Exception
 
 
@@ -48,10 +68,182 @@ class KubernetesOrchestrator:
             except config.ConfigException as e:
                 raise RuntimeError(f"Could not load Kubernetes config: {e}")
 
-        self._core_api = client.CoreV1Api()
         self._k8s_settings = BrokerConfig.settings().orchestrator.kubernetes
+
+        # One shared ApiClient with a widened urllib3 pool: the default
+        # maxsize (4) serializes concurrent spawn/status calls behind a
+        # handful of sockets and forces new TCP/TLS handshakes under load.
+        # Unlike client-go, the Python client has no QPS/Burst limiter, so
+        # the pool size is the effective client-side concurrency knob.
+        cfg = client.Configuration.get_default_copy()
+        cfg.connection_pool_maxsize = self._k8s_settings.connection_pool_maxsize
+        cfg.retries = 3
+        self._api_client = client.ApiClient(configuration=cfg)
+        self._core_api = client.CoreV1Api(api_client=self._api_client)
         self._namespace = self._k8s_settings.namespace
 
+        # Spec factory compiled once: all config is captured in a closure so
+        # _get_pod_spec only performs the per-session substitutions
+        self._make_spec = self._compile_spec_factory()
+
+        # Informer-style local cache of managed pods (name -> V1Pod), kept
+        # current by a background watch so status reads cost zero API calls
+        self._pod_cache: dict[str, Any] = {}
+        self._informer_ready = False
+        # Short-TTL cache for the direct-read fallback path, and the set of
+        # pods already claimed so retried claims skip the PATCH
+        self._status_cache: dict[str, tuple[float, bool]] = {}
+        self._status_ttl = 2.0
+        self._claimed: set[str] = set()
+        threading.Thread(
+            target=self._pod_watch_loop, name="k8s-pod-informer", daemon=True
+        ).start()
+
+    def _pod_watch_loop(self) -> None:
+        """
+        Maintain ``self._pod_cache`` from a list + watch stream.
+
+        Bootstraps with a full list, then applies ADDED/MODIFIED/DELETED
+        events resuming from the list's resourceVersion. A 410 Gone from the
+        API server triggers an immediate re-list; other errors invalidate
+        the cache (readers fall back to direct API calls) and resubscribe.
+        """
+        while True:
+            try:
+                pods = self._core_api.list_namespaced_pod(
+                    namespace=self._namespace, label_selector="guac.managed=true"
+                )
+                self._pod_cache = {p.metadata.name: p for p in pods.items}
+                resource_version = pods.metadata.resource_version
+                self._informer_ready = True
+
+                w = watch.Watch()
+                for event in w.stream(
+                    self._core_api.list_namespaced_pod,
+                    namespace=self._namespace,
+                    label_selector="guac.managed=true",
+                    resource_version=resource_version,
+                ):
+                    pod = event["object"]
+                    if event["type"] == "DELETED":
+                        self._pod_cache.pop(pod.metadata.name, None)
+                    else:
+                        self._pod_cache[pod.metadata.name] = pod
+            except ApiException as e:
+                if e.status == 410:
+                    # Watch history expired: re-list and resume
+                    logger.info("Pod watch expired (410 Gone), re-listing")
+                    continue
+                self._informer_ready = False
+                logger.warning(f"Pod watch error, resubscribing: {e}")
+                time.sleep(2)
+            except Exception as e:
+                self._informer_ready = False
+                logger.warning(f"Pod watch error, resubscribing: {e}")
+                time.sleep(2)
+
+    def _cached_pods(self) -> list[Any] | None:
+        """Return the informer's pod snapshot, or None if not available."""
+        if not self._informer_ready:
+            return None
+        return list(self._pod_cache.values())
+
+    def _compile_spec_factory(self) -> Callable[[str, str | None, str, str], dict[str, Any]]:
+        """
+        Compile a pod-spec factory with all config captured in a closure.
+
+        The session-independent pieces (image, resources, security context,
+        selectors, base labels and env) are assembled exactly once; the
+        returned function only fills in the fields that vary per session.
+        Shared sub-dicts are never mutated after creation, so they can be
+        referenced by every produced spec without copying. The settings
+        object the closure was built from is remembered so _get_pod_spec
+        can recompile after a config hot-reload.
+
+        Returns:
+            Callable (session_id, username, vnc_password, homepage) -> spec
+        """
+        settings = BrokerConfig.settings()
+        self._spec_settings = settings
+        containers_cfg = settings.containers
+        k8s = settings.orchestrator.kubernetes
+        namespace = self._namespace
+
+        base_labels = {"guac.managed": "true", **k8s.labels}
+        static_env = [
+            {"name": "VNC_RESOLUTION", "value": "1920x1080"},
+            {"name": "VNC_COL_DEPTH", "value": "24"},
+        ]
+        # Images that support it POST {session_id, token} here on boot
+        # (token is the VNC password); wait_for_vnc then returns without
+        # waiting for the next socket probe
+        ready_url = get_env("ready_callback_url")
+        if ready_url:
+            static_env.append({"name": "BROKER_READY_URL", "value": ready_url})
+
+        container_base: dict[str, Any] = {
+            "name": "vnc",
+            "image": containers_cfg.image,
+            "imagePullPolicy": k8s.image_pull_policy,
+            "ports": [{"containerPort": 5900, "name": "vnc", "protocol": "TCP"}],
+            "resources": {
+                "requests": {"memory": k8s.resources.requests.memory, "cpu": k8s.resources.requests.cpu},
+                "limits": {"memory": k8s.resources.limits.memory, "cpu": k8s.resources.limits.cpu},
+            },
+            "securityContext": {
+                "runAsNonRoot": k8s.security_context.run_as_non_root,
+                "runAsUser": k8s.security_context.run_as_user,
+            },
+        }
+
+        pod_spec_base: dict[str, Any] = {"restartPolicy": "Never"}
+
+        # Add optional pod spec fields
+        if k8s.node_selector:
+            pod_spec_base["nodeSelector"] = dict(k8s.node_selector)
+
+        if k8s.tolerations:
+            pod_spec_base["tolerations"] = [dict(t) for t in k8s.tolerations]
+
+        if k8s.image_pull_secrets:
+            pod_spec_base["imagePullSecrets"] = [
+                {"name": secret} for secret in k8s.image_pull_secrets
+            ]
+
+        if k8s.service_account:
+            pod_spec_base["serviceAccountName"] = k8s.service_account
+
+        def make_spec(
+            session_id: str, username: str | None, vnc_password: str, homepage: str
+        ) -> dict[str, Any]:
+            labels = {
+                **base_labels,
+                "guac.session.id": session_id,
+                "guac.pool": "true" if not username else "false",
+            }
+            env = [
+                *static_env,
+                {"name": "VNC_PW", "value": vnc_password},
+                {"name": "STARTING_URL", "value": homepage},
+                {"name": "SESSION_ID", "value": session_id},
+            ]
+            if username:
+                labels["guac.username"] = username
+                env.append({"name": "GUAC_USERNAME", "value": username})
+
+            return {
+                "apiVersion": "v1",
+                "kind": "Pod",
+                "metadata": {
+                    "name": f"vnc-{session_id}",
+                    "namespace": namespace,
+                    "labels": labels,
+                },
+                "spec": {**pod_spec_base, "containers": [{**container_base, "env": env}]},
+            }
+
+        return make_spec
+
     def _get_pod_spec(
         self, session_id: str, username: str | None, vnc_password: str
     ) -> dict[str, Any]:
@@ -66,8 +258,12 @@ class KubernetesOrchestrator:
         Returns:
             Pod specification dict
         """
-        containers_cfg = BrokerConfig.settings().containers
-        vnc_image = containers_cfg.image
+        # Recompile the factory if the config was hot-reloaded since it was
+        # built, so broker.yml edits (image, resources, labels) apply to new
+        # spawns without a restart. A racing recompile is benign — both
+        # closures are built from the same settings object
+        if BrokerConfig.settings() is not self._spec_settings:
+            self._make_spec = self._compile_spec_factory()
 
         # For pool containers (no username), use default config
         homepage = "about:blank"
@@ -89,90 +285,54 @@ class KubernetesOrchestrator:
                 f"{len(bookmarks)} bookmarks, homepage={homepage}"
             )
 
-        # Get Kubernetes-specific config
-        k8s = self._k8s_settings
-        k8s_labels = dict(k8s.labels)
-        image_pull_policy = k8s.image_pull_policy
-        image_pull_secrets = list(k8s.image_pull_secrets)
-        node_selector = dict(k8s.node_selector)
-        tolerations = [dict(t) for t in k8s.tolerations]
-
-        # Build labels
-        labels = {
-            "guac.managed": "true",
-            "guac.session.id": session_id,
-            "guac.pool": "true" if not username else "false",
-            **k8s_labels,
-        }
-        if username:
-            labels["guac.username"] = username
-
-        # Build container spec
-        env_vars = [
-            {"name": "VNC_PW", "value": vnc_password},
-            {"name": "VNC_RESOLUTION", "value": "1920x1080"},
-            {"name": "VNC_COL_DEPTH", "value": "24"},
-            {"name": "STARTING_URL", "value": homepage},
-        ]
-        if username:
-            env_vars.append({"name": "GUAC_USERNAME", "value": username})
-
-        container_spec: dict[str, Any] = {
-            "name": "vnc",
-            "image": vnc_image,
-            "imagePullPolicy": image_pull_policy,
-            "env": env_vars,
-            "ports": [{"containerPort": 5900, "name": "vnc", "protocol": "TCP"}],
-        }
+        return self._make_spec(session_id, username, vnc_password, homepage)
 
-        # Add resources
-        container_spec["resources"] = {
-            "requests": {"memory": k8s.resources.requests.memory, "cpu": k8s.resources.requests.cpu},
-            "limits": {"memory": k8s.resources.limits.memory, "cpu": k8s.resources.limits.cpu},
-        }
+    def _wait_for_pod_ip(self, pod_name: str, timeout: int = 60) -> str:
+        """
+        Wait for a Pod to get an IP address.
 
-        # Add security context
-        container_spec["securityContext"] = {
-            "runAsNonRoot": k8s.security_context.run_as_non_root,
-            "runAsUser": k8s.security_context.run_as_user,
-        }
+        Uses a watch stream so the broker is notified the moment the kubelet
+        populates ``status.podIP``, instead of polling the API server once
+        per second. Falls back to polling if the watch cannot be established.
 
-        # Build pod spec
-        pod_spec: dict[str, Any] = {
-            "containers": [container_spec],
-            "restartPolicy": "Never",
-        }
-
-        # Add optional pod spec fields
-        if node_selector:
-            pod_spec["nodeSelector"] = node_selector
+        Args:
+            pod_name: Name of the pod
+            timeout: Timeout in seconds
 
-        if tolerations:
-            pod_spec["tolerations"] = tolerations
+        Returns:
+            Pod IP address
 
-        if image_pull_secrets:
-            pod_spec["imagePullSecrets"] = [
-                {"name": secret} for secret in image_pull_secrets
-            ]
+        Raises:
+            TimeoutError: If pod doesn't get IP within timeout
+        """
+        w = watch.Watch()
+        try:
+            # The stream starts with the current object state, so an already
+            # assigned IP is returned without waiting for a MODIFIED event
+            for event in w.stream(
+                self._core_api.list_namespaced_pod,
+                namespace=self._namespace,
+                field_selector=f"metadata.name={pod_name}",
+                timeout_seconds=timeout,
+            ):
+                if event.get("type") == "DELETED":
+                    raise RuntimeError(
+                        f"Pod {pod_name} was deleted while waiting for IP"
+                    )
+                pod = event["object"]
+                if pod.status.pod_ip:
+                    return str(pod.status.pod_ip)
+        except ApiException as e:
+            logger.warning(f"Watch failed for pod {pod_name}, polling instead: {e}")
+            return self._poll_for_pod_ip(pod_name, timeout)
+        finally:
+            w.stop()
 
-        service_account = k8s.service_account
-        if service_account:
-            pod_spec["serviceAccountName"] = service_account
-
-        return {
-            "apiVersion": "v1",
-            "kind": "Pod",
-            "metadata": {
-                "name": f"vnc-{session_id}",
-                "namespace": self._namespace,
-                "labels": labels,
-            },
-            "spec": pod_spec,
-        }
+        raise TimeoutError(f"Pod {pod_name} did not get IP within {timeout}s")
 
-    def _wait_for_pod_ip(self, pod_name: str, timeout: int = 60) -> str:
+    def _poll_for_pod_ip(self, pod_name: str, timeout: int = 60) -> str:
         """
-        Wait for a Pod to get an IP address.
+        Polling fallback for :meth:`_wait_for_pod_ip`.
 
         Args:
             pod_name: Name of the pod
@@ -184,8 +344,13 @@ class KubernetesOrchestrator:
         Raises:
             TimeoutError: If pod doesn't get IP within timeout
         """
-        start = time.time()
-        while time.time() - start < timeout:
+        # Monotonic deadline: immune to wall-clock steps (NTP) that could
+        # otherwise cut the wait short or extend it indefinitely
+        deadline = time.monotonic() + timeout
+        # Capped exponential backoff: fast first probes for the common case
+        # where the IP lands in ~200 ms, then ease off the API server
+        delay = 0.1
+        while time.monotonic() < deadline:
             try:
                 pod = self._core_api.read_namespaced_pod(
                     name=pod_name, namespace=self._namespace
@@ -194,19 +359,20 @@ class KubernetesOrchestrator:
                     return str(pod.status.pod_ip)
             except ApiException as e:
                 logger.warning(f"Error reading pod {pod_name}: {e}")
-            time.sleep(1)
+            time.sleep(delay)
+            delay = min(delay * 2, 2.0)
 
         raise TimeoutError(f"Pod {pod_name} did not get IP within {timeout}s")
 
     def spawn_container(
-        self, session_id: str, username: str, vnc_password: str
+        self, session_id: str, username: str | None, vnc_password: str
     ) -> ContainerInfo:
         """
         Spawn a VNC Pod.
 
         Args:
             session_id: Session identifier
-            username: Username
+            username: Username (None for pool containers)
             vnc_password: VNC password
 
         Returns:
@@ -239,6 +405,8 @@ class KubernetesOrchestrator:
         Args:
             container_id: Pod name
         """
+        self._status_cache.pop(container_id, None)
+        self._claimed.discard(container_id)
         try:
             self._core_api.delete_namespaced_pod(
                 name=container_id,
@@ -262,16 +430,27 @@ class KubernetesOrchestrator:
         Returns:
             True if running, False otherwise
         """
+        if self._informer_ready:
+            pod = self._pod_cache.get(container_id)
+            return bool(pod is not None and pod.status.phase == "Running")
+
+        cached = self._status_cache.get(container_id)
+        if cached is not None and time.monotonic() - cached[0] < self._status_ttl:
+            return cached[1]
+
         try:
             pod = self._core_api.read_namespaced_pod(
                 name=container_id, namespace=self._namespace
             )
-            return bool(pod.status.phase == "Running")
+            running = bool(pod.status.phase == "Running")
         except ApiException as e:
             if e.status == 404:
+                running = False
+            else:
+                logger.warning(f"Error checking pod status: {e}")
                 return False
-            logger.warning(f"Error checking pod status: {e}")
-            return False
+        self._status_cache[container_id] = (time.monotonic(), running)
+        return running
 
     def get_running_count(self) -> int:
         """
@@ -280,6 +459,10 @@ class KubernetesOrchestrator:
         Returns:
             Number of running pods
         """
+        cached = self._cached_pods()
+        if cached is not None:
+            return sum(1 for pod in cached if pod.status.phase == "Running")
+
         try:
             pods = self._core_api.list_namespaced_pod(
                 namespace=self._namespace,
@@ -300,10 +483,14 @@ class KubernetesOrchestrator:
         """
         result = []
         try:
-            pods = self._core_api.list_namespaced_pod(
-                namespace=self._namespace, label_selector="guac.managed=true"
-            )
-            for pod in pods.items:
+            cached = self._cached_pods()
+            if cached is not None:
+                pod_list = cached
+            else:
+                pod_list = self._core_api.list_namespaced_pod(
+                    namespace=self._namespace, label_selector="guac.managed=true"
+                ).items
+            for pod in pod_list:
                 result.append(
                     {
                         "id": pod.metadata.name,
@@ -327,13 +514,8 @@ class KubernetesOrchestrator:
             Memory usage in GB (estimated)
         """
         try:
-            pods = self._core_api.list_namespaced_pod(
-                namespace=self._namespace,
-                label_selector="guac.managed=true",
-                field_selector="status.phase=Running",
-            )
+            running_count = self.get_running_count()
 
-            total_bytes = 0
             k8s_res = self._k8s_settings.resources
 
             # Use limits if available, otherwise requests
@@ -343,7 +525,7 @@ class KubernetesOrchestrator:
             memory_bytes = self._parse_memory(memory_str)
 
             # Multiply by number of running pods
-            total_bytes = memory_bytes * len(pods.items)
+            total_bytes = memory_bytes * running_count
             return total_bytes / 1024 / 1024 / 1024
 
         except ApiException as e:
@@ -359,12 +541,21 @@ class KubernetesOrchestrator:
         """
         result = []
         try:
-            pods = self._core_api.list_namespaced_pod(
-                namespace=self._namespace,
-                label_selector="guac.managed=true,guac.pool=true",
-                field_selector="status.phase=Running",
-            )
-            for pod in pods.items:
+            cached = self._cached_pods()
+            if cached is not None:
+                pod_list = [
+                    pod
+                    for pod in cached
+                    if pod.status.phase == "Running"
+                    and (pod.metadata.labels or {}).get("guac.pool") == "true"
+                ]
+            else:
+                pod_list = self._core_api.list_namespaced_pod(
+                    namespace=self._namespace,
+                    label_selector="guac.managed=true,guac.pool=true",
+                    field_selector="status.phase=Running",
+                ).items
+            for pod in pod_list:
                 labels = pod.metadata.labels or {}
                 # Only include if not yet claimed (no username label)
                 if "guac.username" not in labels:
@@ -388,24 +579,34 @@ class KubernetesOrchestrator:
         Returns:
             True if claimed successfully, False otherwise
         """
+        # Retried claims (e.g. after a DB conflict upstream) are idempotent;
+        # skip the redundant PATCH
+        if pod_name in self._claimed:
+            return True
+
+        # JSON patch with a "test" precondition on the pool label: the API
+        # server applies the ops atomically, so exactly one claimant wins and
+        # the loser fails the test instead of silently overwriting the labels
+        patch_body = [
+            {"op": "test", "path": "/metadata/labels/guac.pool", "value": "true"},
+            {"op": "replace", "path": "/metadata/labels/guac.pool", "value": "false"},
+            {"op": "add", "path": "/metadata/labels/guac.username", "value": username},
+        ]
         try:
-            # Patch the pod labels
-            patch_body = {
-                "metadata": {
-                    "labels": {
-                        "guac.pool": "false",
-                        "guac.username": username,
-                    }
-                }
-            }
             self._core_api.patch_namespaced_pod(
                 name=pod_name,
                 namespace=self._namespace,
                 body=patch_body,
+                _content_type="application/json-patch+json",
             )
+            self._claimed.add(pod_name)
             logger.info(f"Claimed pool pod {pod_name} for user {username}")
             return True
         except ApiException as e:
+            if e.status in (409, 422):
+                # Test op failed: another claimant got there first
+                logger.info(f"Pod {pod_name} already claimed, trying next")
+                return False
             logger.error(f"Error claiming pod {pod_name}: {e}")
             return False
 
@@ -420,25 +621,7 @@ class KubernetesOrchestrator:
         Returns:
             Memory in bytes
         """
-        memory_str = str(memory_str).strip()
-
-        units = {
-            "Ki": 1024,
-            "Mi": 1024**2,
-            "Gi": 1024**3,
-            "Ti": 1024**4,
-            "K": 1000,
-            "M": 1000**2,
-            "G": 1000**3,
-            "T": 1000**4,
-        }
-
-        for suffix, multiplier in units.items():
-            if memory_str.endswith(suffix):
-                return int(float(memory_str[: -len(suffix)]) * multiplier)
-
-        # Assume bytes if no unit
-        try:
-            return int(memory_str)
-        except ValueError:
+        match = _MEM_RE.match(str(memory_str).strip())
+        if not match:
             return 1024**3  # Default to 1Gi
+        return int(float(match.group(1)) * _MEM_UNITS[match.group(2)])
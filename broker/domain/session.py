@@ -4,13 +4,171 @@ Session management for the Session Broker.
 
 from __future__ import annotations
 
-from typing import Any
+import threading
+import time
+import weakref
+from typing import Any, Iterator
 
-from psycopg2.extras import RealDictCursor
 
 from broker.domain.types import SessionData
 from broker.persistence.database import get_db_connection
 
+# Fixed projection shared by all session reads; _row_to_dict indexes rows
+# positionally against this order. Timestamps are converted to epoch floats
+# in SQL so the driver hands back plain floats instead of datetime objects
+# that would need a .timestamp() call per row
+_SESSION_COLUMNS = (
+    "session_id, username, guac_connection_id, vnc_password, "
+    "container_id, container_ip, "
+    "EXTRACT(EPOCH FROM created_at)::double precision, "
+    "EXTRACT(EPOCH FROM started_at)::double precision, "
+    "EXTRACT(EPOCH FROM last_activity)::double precision"
+)
+
+# Projection for UPDATE ... RETURNING in the claim queries: the container
+# columns come from the pre-claim snapshot (v) since the row itself has
+# just been cleared
+_CLAIMED_COLUMNS = (
+    "s.session_id, s.username, s.guac_connection_id, s.vnc_password, "
+    "v.container_id, v.container_ip, "
+    "EXTRACT(EPOCH FROM s.created_at)::double precision, "
+    "EXTRACT(EPOCH FROM s.started_at)::double precision, "
+    "EXTRACT(EPOCH FROM s.last_activity)::double precision"
+)
+
+# Server-side prepared statements for the hot queries: PREPARE once per
+# pooled connection, then EXECUTE skips parse/rewrite/plan on every call
+_PREPARE_SQL = f"""
+    PREPARE session_get AS
+        SELECT {_SESSION_COLUMNS} FROM broker_sessions WHERE session_id = $1;
+    PREPARE session_get_by_connection AS
+        SELECT {_SESSION_COLUMNS} FROM broker_sessions WHERE guac_connection_id = $1;
+    PREPARE session_get_by_username AS
+        SELECT {_SESSION_COLUMNS} FROM broker_sessions WHERE username = $1;
+    PREPARE session_delete AS
+        DELETE FROM broker_sessions WHERE session_id = $1 RETURNING username;
+    PREPARE session_upsert AS
+        INSERT INTO broker_sessions
+        (session_id, username, guac_connection_id, vnc_password, container_id, container_ip, created_at, started_at, last_activity, updated_at)
+        VALUES ($1, $2, $3, $4, $5, $6, to_timestamp($7), to_timestamp($8), to_timestamp($9), CURRENT_TIMESTAMP)
+        ON CONFLICT (session_id) DO UPDATE SET
+            username = COALESCE(EXCLUDED.username, broker_sessions.username),
+            guac_connection_id = COALESCE(EXCLUDED.guac_connection_id, broker_sessions.guac_connection_id),
+            vnc_password = COALESCE(EXCLUDED.vnc_password, broker_sessions.vnc_password),
+            container_id = COALESCE(EXCLUDED.container_id, broker_sessions.container_id),
+            container_ip = COALESCE(EXCLUDED.container_ip, broker_sessions.container_ip),
+            started_at = COALESCE(EXCLUDED.started_at, broker_sessions.started_at),
+            last_activity = COALESCE(EXCLUDED.last_activity, broker_sessions.last_activity),
+            updated_at = CURRENT_TIMESTAMP;
+"""
+
+_prepared_lock = threading.Lock()
+# Weak references: an entry disappears with its connection object, so a
+# replacement connection that happens to reuse the freed object's address
+# is never mistaken for an already-prepared one, and the set can't grow
+# past the pool size
+_prepared_conns: weakref.WeakSet = weakref.WeakSet()
+
+# Short-TTL read cache for the three point lookups, keyed by lookup kind and
+# value. Hits skip the PG round-trip entirely; every write path evicts, so
+# within-process reads never see stale rows past a save/delete/claim
+_session_cache_lock = threading.RLock()
+_session_cache: dict[tuple[str, str], tuple[float, SessionData]] = {}
+_SESSION_CACHE_TTL = 5.0
+_SESSION_CACHE_MAX = 4096
+
+
+def _cache_lookup(kind: str, value: str) -> SessionData | None:
+    """Return a fresh cached SessionData for (kind, value), or None."""
+    with _session_cache_lock:
+        entry = _session_cache.get((kind, value))
+        if entry is not None and time.monotonic() - entry[0] < _SESSION_CACHE_TTL:
+            return entry[1]
+    return None
+
+
+def _cache_store(session: SessionData) -> None:
+    """Populate all lookup keys for a fetched row."""
+    now = time.monotonic()
+    with _session_cache_lock:
+        if len(_session_cache) >= _SESSION_CACHE_MAX:
+            _session_cache.clear()
+        _session_cache[("id", session.session_id)] = (now, session)
+        if session.username:
+            _session_cache[("user", session.username)] = (now, session)
+        if session.guac_connection_id:
+            _session_cache[("conn", session.guac_connection_id)] = (now, session)
+
+
+def _cache_evict(session_id: str) -> None:
+    """Drop every cache entry referencing a session."""
+    _pool_cache_invalidate()
+    with _session_cache_lock:
+        stale = [
+            key for key, (_, session) in _session_cache.items()
+            if session.session_id == session_id
+        ]
+        for key in stale:
+            del _session_cache[key]
+
+
+# The pool listing is read on every sync tick and on every provision; a
+# ~2s-old view is fine for both (claims are atomic in SQL, so a stale
+# entry just fails to claim). Every write path invalidates via
+# _cache_evict so the in-process view never lags a local write
+_pool_cache_lock = threading.Lock()
+_pool_cache: tuple[float, list[SessionData]] | None = None
+_POOL_CACHE_TTL = 2.0
+
+
+def _pool_cache_invalidate() -> None:
+    """Drop the cached pool-session listing."""
+    global _pool_cache
+    with _pool_cache_lock:
+        _pool_cache = None
+
+
+def _ensure_prepared(conn: Any) -> None:
+    """
+    PREPARE the hot statements on a pooled connection, once per connection.
+
+    The PREPARE is committed immediately so a later rollback on the same
+    connection cannot silently deallocate statements we still consider
+    prepared.
+    """
+    if conn in _prepared_conns:
+        return
+    with _prepared_lock:
+        if conn in _prepared_conns:
+            return
+        with conn.cursor() as cur:
+            cur.execute(_PREPARE_SQL)
+        conn.commit()
+        _prepared_conns.add(conn)
+
+# In-memory mirror of SELECT DISTINCT username, loaded lazily and kept
+# current by the save/delete/claim paths so sync cycles skip the full scan
+_users_lock = threading.RLock()
+_provisioned_users: set[str] | None = None
+
+
+def _track_user(username: str | None) -> None:
+    """Record a username in the provisioned-users mirror, if loaded."""
+    if not username:
+        return
+    with _users_lock:
+        if _provisioned_users is not None:
+            _provisioned_users.add(username)
+
+
+def _untrack_user(username: str | None) -> None:
+    """Remove a username from the provisioned-users mirror, if loaded."""
+    if not username:
+        return
+    with _users_lock:
+        if _provisioned_users is not None:
+            _provisioned_users.discard(username)
+
 
 class SessionStore:
     """Manages session data in PostgreSQL."""
@@ -25,22 +183,11 @@ class SessionStore:
             data: Session data (SessionData or dict)
         """
         d = data.to_dict() if isinstance(data, SessionData) else data
+        _cache_evict(session_id)
         with get_db_connection() as conn:
+            _ensure_prepared(conn)
             with conn.cursor() as cur:
-                cur.execute("""
-                    INSERT INTO broker_sessions
-                    (session_id, username, guac_connection_id, vnc_password, container_id, container_ip, created_at, started_at, last_activity, updated_at)
-                    VALUES (%s, %s, %s, %s, %s, %s, to_timestamp(%s), to_timestamp(%s), to_timestamp(%s), CURRENT_TIMESTAMP)
-                    ON CONFLICT (session_id) DO UPDATE SET
-                        username = COALESCE(EXCLUDED.username, broker_sessions.username),
-                        guac_connection_id = COALESCE(EXCLUDED.guac_connection_id, broker_sessions.guac_connection_id),
-                        vnc_password = COALESCE(EXCLUDED.vnc_password, broker_sessions.vnc_password),
-                        container_id = COALESCE(EXCLUDED.container_id, broker_sessions.container_id),
-                        container_ip = COALESCE(EXCLUDED.container_ip, broker_sessions.container_ip),
-                        started_at = COALESCE(EXCLUDED.started_at, broker_sessions.started_at),
-                        last_activity = COALESCE(EXCLUDED.last_activity, broker_sessions.last_activity),
-                        updated_at = CURRENT_TIMESTAMP
-                """, (
+                cur.execute("EXECUTE session_upsert (%s, %s, %s, %s, %s, %s, %s, %s, %s)", (
                     session_id,
                     d.get("username"),
                     d.get("guac_connection_id"),
@@ -51,23 +198,18 @@ class SessionStore:
                     d.get("started_at"),
                     d.get("last_activity")
                 ))
+        _track_user(d.get("username"))
 
     @staticmethod
-    def _row_to_dict(row: dict[str, Any] | None) -> SessionData | None:
-        """Convert database row to SessionData."""
-        if not row:
-            return None
-        return SessionData(
-            session_id=row["session_id"],
-            username=row["username"],
-            guac_connection_id=row["guac_connection_id"],
-            vnc_password=row["vnc_password"],
-            container_id=row["container_id"],
-            container_ip=row["container_ip"],
-            created_at=row["created_at"].timestamp() if row["created_at"] else None,
-            started_at=row["started_at"].timestamp() if row["started_at"] else None,
-            last_activity=row["last_activity"].timestamp() if row.get("last_activity") else None,
-        )
+    def _row_to_dict(row: tuple | None) -> SessionData | None:
+        """
+        Convert a ``_SESSION_COLUMNS``-ordered row to SessionData.
+
+        The projection is kept in dataclass field order on purpose, so the
+        row tuple unpacks straight into the constructor — no per-column
+        keyword passing or branching in the row loop.
+        """
+        return SessionData(*row) if row else None
 
     @staticmethod
     def get_session(session_id: str) -> SessionData | None:
@@ -80,10 +222,17 @@ class SessionStore:
         Returns:
             Session data or None
         """
+        cached = _cache_lookup("id", session_id)
+        if cached is not None:
+            return cached
         with get_db_connection() as conn:
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute("SELECT * FROM broker_sessions WHERE session_id = %s", (session_id,))
-                return SessionStore._row_to_dict(cur.fetchone())
+            _ensure_prepared(conn)
+            with conn.cursor() as cur:
+                cur.execute("EXECUTE session_get (%s)", (session_id,))
+                session = SessionStore._row_to_dict(cur.fetchone())
+        if session is not None:
+            _cache_store(session)
+        return session
 
     @staticmethod
     def delete_session(session_id: str) -> None:
@@ -93,9 +242,14 @@ class SessionStore:
         Args:
             session_id: Session identifier
         """
+        _cache_evict(session_id)
         with get_db_connection() as conn:
+            _ensure_prepared(conn)
             with conn.cursor() as cur:
-                cur.execute("DELETE FROM broker_sessions WHERE session_id = %s", (session_id,))
+                cur.execute("EXECUTE session_delete (%s)", (session_id,))
+                row = cur.fetchone()
+        if row:
+            _untrack_user(row[0])
 
     @staticmethod
     def get_session_by_connection(connection_id: str) -> SessionData | None:
@@ -108,10 +262,17 @@ class SessionStore:
         Returns:
             Session data or None
         """
+        cached = _cache_lookup("conn", connection_id)
+        if cached is not None:
+            return cached
         with get_db_connection() as conn:
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute("SELECT * FROM broker_sessions WHERE guac_connection_id = %s", (connection_id,))
-                return SessionStore._row_to_dict(cur.fetchone())
+            _ensure_prepared(conn)
+            with conn.cursor() as cur:
+                cur.execute("EXECUTE session_get_by_connection (%s)", (connection_id,))
+                session = SessionStore._row_to_dict(cur.fetchone())
+        if session is not None:
+            _cache_store(session)
+        return session
 
     @staticmethod
     def get_session_by_username(username: str) -> SessionData | None:
@@ -124,23 +285,130 @@ class SessionStore:
         Returns:
             Session data or None
         """
+        cached = _cache_lookup("user", username)
+        if cached is not None:
+            return cached
+        with get_db_connection() as conn:
+            _ensure_prepared(conn)
+            with conn.cursor() as cur:
+                cur.execute("EXECUTE session_get_by_username (%s)", (username,))
+                session = SessionStore._row_to_dict(cur.fetchone())
+        if session is not None:
+            _cache_store(session)
+        return session
+
+    @staticmethod
+    def list_sessions() -> Iterator[SessionData | None]:
+        """
+        Stream all sessions.
+
+        Uses a named (server-side) cursor so rows arrive in batches of
+        ``itersize`` instead of materializing the whole table; wrap in
+        ``list(...)`` where a list is needed.
+
+        Yields:
+            SessionData per row
+        """
         with get_db_connection() as conn:
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute("SELECT * FROM broker_sessions WHERE username = %s", (username,))
-                return SessionStore._row_to_dict(cur.fetchone())
+            with conn.cursor(name="sessions_scan") as cur:
+                cur.itersize = 1000
+                cur.execute(
+                    f"SELECT {_SESSION_COLUMNS} FROM broker_sessions ORDER BY created_at DESC"
+                )
+                for row in cur:
+                    yield SessionStore._row_to_dict(row)
 
     @staticmethod
-    def list_sessions() -> list[SessionData | None]:
+    def claim_idle_with_containers(cutoff_ts: float, exclude_conn_ids: set[str]) -> list[SessionData]:
         """
-        List all sessions.
+        Atomically claim sessions holding a container that have been idle
+        since before ``cutoff_ts``, excluding currently active connections.
+
+        The container columns are cleared in the same statement that
+        selects the victims (FOR UPDATE SKIP LOCKED), so a concurrent
+        cleanup pass can never claim the same row and double-destroy a
+        container. The returned SessionData carry the pre-claim container
+        fields for the caller to destroy.
+
+        Sessions with neither last_activity nor started_at are skipped
+        (COALESCE yields NULL, which never compares below the cutoff).
+
+        Args:
+            cutoff_ts: Epoch seconds; only sessions idle since before this
+            exclude_conn_ids: Guacamole connection IDs currently in use
 
         Returns:
-            List of session dictionaries
+            List of claimed SessionData with their former container fields
         """
         with get_db_connection() as conn:
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute("SELECT * FROM broker_sessions ORDER BY created_at DESC")
-                return [SessionStore._row_to_dict(row) for row in cur.fetchall()]
+            with conn.cursor() as cur:
+                cur.execute(f"""
+                    WITH victims AS (
+                        SELECT session_id, container_id, container_ip
+                        FROM broker_sessions
+                        WHERE container_id IS NOT NULL
+                        AND COALESCE(last_activity, started_at) < to_timestamp(%s)
+                        AND (guac_connection_id IS NULL
+                             OR guac_connection_id <> ALL(%s::text[]))
+                        FOR UPDATE SKIP LOCKED
+                    )
+                    UPDATE broker_sessions s
+                    SET container_id = NULL, container_ip = NULL,
+                        updated_at = CURRENT_TIMESTAMP
+                    FROM victims v
+                    WHERE s.session_id = v.session_id
+                    RETURNING {_CLAIMED_COLUMNS}
+                """, (cutoff_ts, list(exclude_conn_ids)))
+                rows = cur.fetchall()
+        for row in rows:
+            _cache_evict(row[0])
+        # Fetched rows are never None; unpack directly so the element
+        # type stays SessionData (not Optional)
+        return [SessionData(*row) for row in rows]
+
+    @staticmethod
+    def claim_oldest_idle(limit: int, exclude_conn_ids: set[str]) -> list[SessionData]:
+        """
+        Atomically claim the *limit* longest-idle sessions holding a
+        container, excluding currently active connections.
+
+        Same claim semantics as :meth:`claim_idle_with_containers`; the
+        ORDER BY + LIMIT run in Postgres so picking a handful of victims
+        never streams the whole table to Python.
+
+        Args:
+            limit: Maximum number of sessions to claim
+            exclude_conn_ids: Guacamole connection IDs currently in use
+
+        Returns:
+            List of claimed SessionData, oldest activity first
+        """
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(f"""
+                    WITH victims AS (
+                        SELECT session_id, container_id, container_ip
+                        FROM broker_sessions
+                        WHERE container_id IS NOT NULL
+                        AND (guac_connection_id IS NULL
+                             OR guac_connection_id <> ALL(%s::text[]))
+                        ORDER BY COALESCE(last_activity, started_at) ASC NULLS FIRST
+                        LIMIT %s
+                        FOR UPDATE SKIP LOCKED
+                    )
+                    UPDATE broker_sessions s
+                    SET container_id = NULL, container_ip = NULL,
+                        updated_at = CURRENT_TIMESTAMP
+                    FROM victims v
+                    WHERE s.session_id = v.session_id
+                    RETURNING {_CLAIMED_COLUMNS}
+                """, (list(exclude_conn_ids), limit))
+                rows = cur.fetchall()
+        for row in rows:
+            _cache_evict(row[0])
+        # Fetched rows are never None; unpack directly so the element
+        # type stays SessionData (not Optional)
+        return [SessionData(*row) for row in rows]
 
     @staticmethod
     def get_provisioned_users() -> set:
@@ -150,10 +418,30 @@ class SessionStore:
         Returns:
             Set of usernames
         """
+        global _provisioned_users
+        with _users_lock:
+            if _provisioned_users is not None:
+                return set(_provisioned_users)
         with get_db_connection() as conn:
             with conn.cursor() as cur:
-                cur.execute("SELECT DISTINCT username FROM broker_sessions WHERE username IS NOT NULL")
-                return {row[0] for row in cur.fetchall()}
+                # Loose index scan: hop between distinct keys of the partial
+                # unique username index instead of aggregating the whole table
+                # (a plain SELECT DISTINCT sorts/hashes every row)
+                cur.execute("""
+                    WITH RECURSIVE t AS (
+                        (SELECT username FROM broker_sessions
+                         WHERE username IS NOT NULL ORDER BY username LIMIT 1)
+                        UNION ALL
+                        SELECT (SELECT username FROM broker_sessions
+                                WHERE username > t.username ORDER BY username LIMIT 1)
+                        FROM t WHERE t.username IS NOT NULL
+                    )
+                    SELECT username FROM t WHERE username IS NOT NULL
+                """)
+                users = {row[0] for row in cur.fetchall()}
+        with _users_lock:
+            _provisioned_users = set(users)
+        return users
 
     @staticmethod
     def get_sessions_needing_containers() -> list[SessionData]:
@@ -165,29 +453,33 @@ class SessionStore:
             List of SessionData needing containers
         """
         # Import here to avoid circular imports
-        from broker.domain.container import is_container_running
+        from broker.domain.container import get_running_container_ids
+
+        # One list call instead of one status lookup per session; the id set
+        # is pushed into the query so rows with a live container never leave
+        # the database
+        running = get_running_container_ids()
 
         with get_db_connection() as conn:
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute("""
-                    SELECT * FROM broker_sessions
+            with conn.cursor() as cur:
+                cur.execute(f"""
+                    SELECT {_SESSION_COLUMNS} FROM broker_sessions
                     WHERE guac_connection_id IS NOT NULL
+                    AND (container_id IS NULL
+                         OR container_id NOT IN (SELECT unnest(%s::text[])))
                     ORDER BY created_at DESC
-                """)
+                """, (list(running),))
                 sessions = [SessionStore._row_to_dict(row) for row in cur.fetchall()]
 
-        # Filter to sessions without running containers
         result: list[SessionData] = []
         for session in sessions:
             if session is None:
                 continue
-            if not session.container_id:
-                result.append(session)
-            elif not is_container_running(session.container_id):
+            if session.container_id:
                 # Container was removed, clear the stale ID
                 session.container_id = None
                 session.container_ip = None
-                result.append(session)
+            result.append(session)
         return result
 
     @staticmethod
@@ -200,26 +492,42 @@ class SessionStore:
             List of pool SessionData
         """
         # Import here to avoid circular imports
-        from broker.domain.container import is_container_running
+        from broker.domain.container import get_running_container_ids
+
+        global _pool_cache
+        with _pool_cache_lock:
+            cached = _pool_cache
+            if cached is not None and time.monotonic() - cached[0] < _POOL_CACHE_TTL:
+                return cached[1]
 
         with get_db_connection() as conn:
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            with conn.cursor() as cur:
                 cur.execute("""
-                    SELECT * FROM broker_sessions
+                    SELECT session_id, vnc_password, container_id, container_ip,
+                           EXTRACT(EPOCH FROM created_at)::double precision
+                    FROM broker_sessions
                     WHERE username IS NULL
                     AND container_id IS NOT NULL
                     ORDER BY created_at ASC
                 """)
-                sessions = [SessionStore._row_to_dict(row) for row in cur.fetchall()]
-
-        # Filter to sessions with running containers
-        result: list[SessionData] = []
-        for session in sessions:
-            if session is None:
-                continue
-            if session.container_id and is_container_running(session.container_id):
-                result.append(session)
-        return result
+                rows = cur.fetchall()
+
+        # One list call instead of one status lookup per pool row
+        running = get_running_container_ids()
+        sessions = [
+            SessionData(
+                session_id=row[0],
+                vnc_password=row[1],
+                container_id=row[2],
+                container_ip=row[3],
+                created_at=row[4],
+            )
+            for row in rows
+            if row[2] in running
+        ]
+        with _pool_cache_lock:
+            _pool_cache = (time.monotonic(), sessions)
+        return sessions
 
     @staticmethod
     def claim_pool_session(session_id: str, username: str) -> bool:
@@ -235,9 +543,21 @@ class SessionStore:
         """
         with get_db_connection() as conn:
             with conn.cursor() as cur:
+                # SKIP LOCKED: a concurrent claimant holding the row lock makes
+                # this return 0 rows immediately instead of blocking until its
+                # transaction commits and then failing anyway
                 cur.execute("""
                     UPDATE broker_sessions
                     SET username = %s, updated_at = CURRENT_TIMESTAMP
-                    WHERE session_id = %s AND username IS NULL
+                    WHERE session_id = (
+                        SELECT session_id FROM broker_sessions
+                        WHERE session_id = %s AND username IS NULL
+                        FOR UPDATE SKIP LOCKED
+                    )
+                    RETURNING session_id
                 """, (username, session_id))
-                return bool(cur.rowcount > 0)
+                claimed = bool(cur.rowcount > 0)
+        if claimed:
+            _cache_evict(session_id)
+            _track_user(username)
+        return claimed
@@ -27,7 +27,10 @@ class SessionData:
 
     @classmethod
     def from_dict(cls, data: dict[str, Any]) -> SessionData:
-        # Only pass keys that match dataclass fields
-        valid_keys = {f.name for f in cls.__dataclass_fields__.values()}
-        filtered = {k: v for k, v in data.items() if k in valid_keys}
-        return cls(**filtered)
+        # Only pass keys that match dataclass fields; the set intersection
+        # runs in C and skips iterating large input dicts
+        return cls(**{k: data[k] for k in _SESSION_FIELDS & data.keys()})
+
+
+# Field names computed once instead of per from_dict call
+_SESSION_FIELDS = frozenset(SessionData.__dataclass_fields__)
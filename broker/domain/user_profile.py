@@ -4,13 +4,20 @@ User profile management for browser policies (Firefox & Chromium).
 
 from __future__ import annotations
 
+import hashlib
 import json
 import logging
 import os
 import re
+import threading
 from pathlib import Path
 from typing import Any
 
+try:
+    import orjson
+except ImportError:
+    orjson = None  # type: ignore[assignment]
+
 from broker.config.settings import get_env
 from broker.config.loader import BrokerConfig, ProfilesConfig
 from broker.api.validators import sanitize_for_path
@@ -21,10 +28,34 @@ logger = logging.getLogger("session-broker")
 USER_DATA_PATH = Path(get_env("user_data_path", "/data/users") or "/data/users")
 USER_DATA_PATH.mkdir(parents=True, exist_ok=True)
 
+# Single merged pattern for autofill variable expansion, compiled once so
+# every value is resolved in one scan instead of one pass per variable kind
+_VAR_RE = re.compile(r'\$\{(GUAC_USERNAME|vault:[^}]+|env:[^}]+)\}')
+
+# Directories already materialized this process; mkdir(parents=True,
+# exist_ok=True) stats the whole ancestor chain on every call, which adds
+# up when profiles are re-applied on each spawn
+_dirs_lock = threading.Lock()
+_dirs_created: set[Path] = set()
+
+
+def _ensure_dir(path: Path) -> None:
+    """Create a directory tree once per process, skipping repeat syscalls."""
+    with _dirs_lock:
+        if path in _dirs_created:
+            return
+    path.mkdir(parents=True, exist_ok=True)
+    with _dirs_lock:
+        _dirs_created.add(path)
+
 
 class UserProfile:
     """Manages user profile data (browser bookmarks, autofill, etc.)."""
 
+    # Last-applied policy hash per username, so repeated spawns (e.g. pool
+    # claims) skip rewriting identical policy files
+    _applied_hashes: dict[str, str] = {}
+
     @staticmethod
     def get_user_path(username: str) -> Path:
         """
@@ -54,13 +85,13 @@ class UserProfile:
         browser_type = BrokerConfig.get_browser_type()
 
         # Create common directories
-        (user_path / "desktop").mkdir(parents=True, exist_ok=True)
+        _ensure_dir(user_path / "desktop")
 
         # Create browser-specific directories
         if browser_type == "firefox":
-            (user_path / "firefox-policies").mkdir(parents=True, exist_ok=True)
+            _ensure_dir(user_path / "firefox-policies")
         else:
-            (user_path / "chromium-policies" / "managed").mkdir(parents=True, exist_ok=True)
+            _ensure_dir(user_path / "chromium-policies" / "managed")
 
         return user_path
 
@@ -135,30 +166,23 @@ class UserProfile:
         """
         from broker.config.secrets import secrets_provider
 
-        vault_pattern = re.compile(r'\$\{vault:([^}]+)\}')
-        env_pattern = re.compile(r'\$\{env:([^}]+)\}')
+        def resolve(match: re.Match) -> str:
+            var = match.group(1)
+            if var == "GUAC_USERNAME":
+                return username
+            if var.startswith("vault:"):
+                secret_key = var[len("vault:"):]
+                secret_value = secrets_provider.get(secret_key, "")
+                if not secret_value:
+                    logger.warning(f"Vault secret not found: {secret_key}")
+                return secret_value or ""
+            # env:VAR
+            return os.environ.get(var[len("env:"):], "")
 
         def expand_value(value: str) -> str:
             if not isinstance(value, str):
                 return value
-
-            value = value.replace("${GUAC_USERNAME}", username)
-
-            for match in vault_pattern.finditer(value):
-                secret_key = match.group(1)
-                secret_value = secrets_provider.get(secret_key, "")
-                if secret_value:
-                    value = value.replace(match.group(0), secret_value)
-                else:
-                    logger.warning(f"Vault secret not found: {secret_key}")
-                    value = value.replace(match.group(0), "")
-
-            for match in env_pattern.finditer(value):
-                env_var = match.group(1)
-                env_value = os.environ.get(env_var, "")
-                value = value.replace(match.group(0), env_value)
-
-            return value
+            return _VAR_RE.sub(resolve, value)
 
         expanded = []
         for entry in autofill:
@@ -166,6 +190,25 @@ class UserProfile:
             expanded.append(new_entry)
         return expanded
 
+    @staticmethod
+    def _write_policy_file(path: Path, policies: dict) -> None:
+        """
+        Serialize and write a policy file, skipping the write when the
+        on-disk content is already identical (repeated re-applies would
+        otherwise churn shared storage and bind-mount watchers for nothing).
+        Writes go through a temp file + os.replace so readers never see a
+        partially written file.
+        """
+        if orjson is not None:
+            new_bytes = orjson.dumps(policies)
+        else:
+            new_bytes = json.dumps(policies, separators=(",", ":")).encode()
+        if path.exists() and path.read_bytes() == new_bytes:
+            return
+        tmp = path.with_suffix(".tmp")
+        tmp.write_bytes(new_bytes)
+        os.replace(tmp, path)
+
     @staticmethod
     def add_bookmark(username: str, name: str, url: str) -> None:
         """Add a single bookmark for a user by re-applying browser policies."""
@@ -181,7 +224,7 @@ class UserProfile:
         """Generate Firefox enterprise policies."""
         user_path = UserProfile.get_user_path(username)
         policies_dir = user_path / "firefox-policies"
-        policies_dir.mkdir(parents=True, exist_ok=True)
+        _ensure_dir(policies_dir)
 
         managed_bookmarks = [
             {"name": bm["name"], "url": bm["url"]}
@@ -243,14 +286,14 @@ class UserProfile:
                 policies["policies"]["OfferToSaveLogins"] = False
                 policies["policies"]["Logins"] = logins
 
-        (policies_dir / "policies.json").write_text(json.dumps(policies, indent=2))
+        UserProfile._write_policy_file(policies_dir / "policies.json", policies)
 
     @staticmethod
     def _set_chromium_policies(username: str, bookmarks: list, homepage: str, autofill: list) -> None:
         """Generate Chromium enterprise policies."""
         user_path = UserProfile.get_user_path(username)
         policies_dir = user_path / "chromium-policies" / "managed"
-        policies_dir.mkdir(parents=True, exist_ok=True)
+        _ensure_dir(policies_dir)
 
         # Build managed bookmarks for Chromium format
         managed_bookmarks = []
@@ -310,7 +353,7 @@ class UserProfile:
                 )
             policies["PasswordManagerEnabled"] = True
 
-        (policies_dir / "bookmarks.json").write_text(json.dumps(policies, indent=2))
+        UserProfile._write_policy_file(policies_dir / "bookmarks.json", policies)
 
     @staticmethod
     def set_browser_policies(username: str, bookmarks: list, homepage: str = "", autofill: list[Any] | None = None) -> None:
@@ -326,10 +369,23 @@ class UserProfile:
         browser_type = BrokerConfig.get_browser_type()
         autofill = autofill or []
 
+        # Skip the rewrite when the effective policy inputs are unchanged
+        digest = hashlib.blake2b(
+            json.dumps(
+                [browser_type, bookmarks, homepage, autofill],
+                sort_keys=True, default=str,
+            ).encode(),
+            digest_size=16,
+        ).hexdigest()
+        if UserProfile._applied_hashes.get(username) == digest:
+            logger.debug(f"Browser policies unchanged for {username}, skipping write")
+            return
+
         if browser_type == "firefox":
             UserProfile._set_firefox_policies(username, bookmarks, homepage, autofill)
         else:
             UserProfile._set_chromium_policies(username, bookmarks, homepage, autofill)
+        UserProfile._applied_hashes[username] = digest
 
     @staticmethod
     def apply_profile_config(username: str, user_groups: list) -> dict:
@@ -7,6 +7,7 @@ and uses SQLAlchemy (bundled with Alembic) for the connection layer.
 
 from alembic import context
 from sqlalchemy import create_engine
+from sqlalchemy.pool import NullPool
 
 from broker.persistence.database import DB_CONFIG
 
@@ -32,7 +33,9 @@ def run_migrations_offline() -> None:
 
 def run_migrations_online() -> None:
     """Run migrations in 'online' mode with a live database connection."""
-    engine = create_engine(_build_url())
+    # One-shot run: NullPool opens a single connection and closes it on
+    # dispose, skipping the default QueuePool bookkeeping entirely
+    engine = create_engine(_build_url(), poolclass=NullPool)
     with engine.connect() as conn:
         context.configure(
             connection=conn,
@@ -14,7 +14,8 @@ depends_on = None
 
 
 def upgrade() -> None:
-    # Sessions table
+    # One multi-statement execute: the whole bootstrap is a single
+    # protocol round-trip instead of ~10
     op.execute("""
         CREATE TABLE IF NOT EXISTS broker_sessions (
             session_id VARCHAR(36) PRIMARY KEY,
@@ -27,11 +28,8 @@ def upgrade() -> None:
             started_at TIMESTAMP,
             last_activity TIMESTAMP,
             updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
+        );
 
-    # Groups table
-    op.execute("""
         CREATE TABLE IF NOT EXISTS broker_groups (
             group_name VARCHAR(255) PRIMARY KEY,
             description TEXT,
@@ -39,11 +37,8 @@ def upgrade() -> None:
             wallpaper VARCHAR(255),
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
+        );
 
-    # Bookmarks table
-    op.execute("""
         CREATE TABLE IF NOT EXISTS broker_bookmarks (
             id SERIAL PRIMARY KEY,
             group_name VARCHAR(255) REFERENCES broker_groups(group_name) ON DELETE CASCADE,
@@ -51,44 +46,34 @@ def upgrade() -> None:
             url TEXT NOT NULL,
             position INTEGER DEFAULT 0,
             UNIQUE(group_name, url)
-        )
-    """)
+        );
 
-    # Settings table
-    op.execute("""
         CREATE TABLE IF NOT EXISTS broker_settings (
             key VARCHAR(255) PRIMARY KEY,
             value TEXT,
             updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
+        );
 
-    # Indexes
-    op.execute("CREATE INDEX IF NOT EXISTS idx_sessions_username ON broker_sessions(username)")
-    op.execute("CREATE INDEX IF NOT EXISTS idx_sessions_connection ON broker_sessions(guac_connection_id)")
-    op.execute("CREATE INDEX IF NOT EXISTS idx_bookmarks_group ON broker_bookmarks(group_name)")
-    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_sessions_username ON broker_sessions(username);
+        CREATE INDEX IF NOT EXISTS idx_sessions_connection ON broker_sessions(guac_connection_id);
+        CREATE INDEX IF NOT EXISTS idx_bookmarks_group ON broker_bookmarks(group_name);
         CREATE UNIQUE INDEX IF NOT EXISTS idx_sessions_username_unique
-        ON broker_sessions(username) WHERE username IS NOT NULL
-    """)
+        ON broker_sessions(username) WHERE username IS NOT NULL;
 
-    # Default settings
-    op.execute("""
         INSERT INTO broker_settings (key, value)
         VALUES ('merge_bookmarks', 'true'), ('inherit_from_default', 'true')
-        ON CONFLICT (key) DO NOTHING
-    """)
+        ON CONFLICT (key) DO NOTHING;
 
-    # Default group
-    op.execute("""
         INSERT INTO broker_groups (group_name, description, priority)
         VALUES ('default', 'Default configuration for all users', 0)
-        ON CONFLICT (group_name) DO NOTHING
+        ON CONFLICT (group_name) DO NOTHING;
     """)
 
 
 def downgrade() -> None:
-    op.execute("DROP TABLE IF EXISTS broker_bookmarks")
-    op.execute("DROP TABLE IF EXISTS broker_settings")
-    op.execute("DROP TABLE IF EXISTS broker_sessions")
-    op.execute("DROP TABLE IF EXISTS broker_groups")
+    op.execute("""
+        DROP TABLE IF EXISTS broker_bookmarks;
+        DROP TABLE IF EXISTS broker_settings;
+        DROP TABLE IF EXISTS broker_sessions;
+        DROP TABLE IF EXISTS broker_groups;
+    """)
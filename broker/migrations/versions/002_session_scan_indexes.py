@@ -0,0 +1,40 @@
+"""Partial indexes for pool and pre-warm session scans.
+
+Lookups by username and guac_connection_id are already indexed by the
+initial schema; this adds partial indexes matching the predicates of
+get_pool_sessions() and get_sessions_needing_containers() so those scans
+stay index-driven as broker_sessions grows.
+
+Revision ID: 002
+Revises: 001
+Create Date: 2026-08-28 00:00:00.000000
+"""
+
+from alembic import op
+
+revision = "002"
+down_revision = "001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Pool scan: WHERE username IS NULL AND container_id IS NOT NULL
+    # ORDER BY created_at
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_sessions_pool
+        ON broker_sessions(created_at)
+        WHERE username IS NULL AND container_id IS NOT NULL
+    """)
+
+    # Pre-warm scan: WHERE guac_connection_id IS NOT NULL ORDER BY created_at
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_sessions_provisioned
+        ON broker_sessions(created_at)
+        WHERE guac_connection_id IS NOT NULL
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS idx_sessions_pool")
+    op.execute("DROP INDEX IF EXISTS idx_sessions_provisioned")
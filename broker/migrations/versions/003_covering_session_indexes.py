@@ -0,0 +1,49 @@
+"""Covering indexes for session point lookups.
+
+get_session_by_username and get_session_by_connection read the full
+session row through their respective indexes; without INCLUDE columns
+every match still costs a heap fetch. Rebuilding both indexes with the
+remaining projected columns lets the planner answer these lookups with
+an index-only scan (visibility map permitting).
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-08-28 00:00:00.000000
+"""
+
+from alembic import op
+
+revision = "003"
+down_revision = "002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Username lookup: partial (username IS NOT NULL) + covering
+    op.execute("DROP INDEX IF EXISTS idx_sessions_username")
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_sessions_username
+        ON broker_sessions(username)
+        INCLUDE (session_id, guac_connection_id, vnc_password, container_id,
+                 container_ip, created_at, started_at, last_activity)
+        WHERE username IS NOT NULL
+    """)
+
+    # Connection lookup: same treatment
+    op.execute("DROP INDEX IF EXISTS idx_sessions_connection")
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_sessions_connection
+        ON broker_sessions(guac_connection_id)
+        INCLUDE (session_id, username, vnc_password, container_id,
+                 container_ip, created_at, started_at, last_activity)
+        WHERE guac_connection_id IS NOT NULL
+    """)
+
+
+def downgrade() -> None:
+    # Restore the plain non-covering indexes from the initial schema
+    op.execute("DROP INDEX IF EXISTS idx_sessions_username")
+    op.execute("CREATE INDEX IF NOT EXISTS idx_sessions_username ON broker_sessions(username)")
+    op.execute("DROP INDEX IF EXISTS idx_sessions_connection")
+    op.execute("CREATE INDEX IF NOT EXISTS idx_sessions_connection ON broker_sessions(guac_connection_id)")
@@ -0,0 +1,38 @@
+"""Switch broker_sessions timestamps to timestamptz.
+
+TIMESTAMP WITHOUT TIME ZONE leaves the interpretation of stored values to
+whoever reads them; timestamptz pins them to UTC on the wire, which keeps
+to_timestamp() writes and EXTRACT(EPOCH ...) reads exact regardless of the
+server's TimeZone setting. Existing values are reinterpreted as UTC.
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-08-28 00:00:00.000000
+"""
+
+from alembic import op
+
+revision = "004"
+down_revision = "003"
+branch_labels = None
+depends_on = None
+
+_COLUMNS = ("created_at", "started_at", "last_activity", "updated_at")
+
+
+def upgrade() -> None:
+    for column in _COLUMNS:
+        op.execute(f"""
+            ALTER TABLE broker_sessions
+            ALTER COLUMN {column} TYPE timestamptz
+            USING {column} AT TIME ZONE 'UTC'
+        """)
+
+
+def downgrade() -> None:
+    for column in _COLUMNS:
+        op.execute(f"""
+            ALTER TABLE broker_sessions
+            ALTER COLUMN {column} TYPE timestamp
+            USING {column} AT TIME ZONE 'UTC'
+        """)
@@ -0,0 +1,31 @@
+"""Expression index for the idle-container cleanup scan.
+
+claim_idle_with_containers filters on
+COALESCE(last_activity, started_at) < cutoff for rows holding a
+container; this index matches that expression and predicate so the
+five-minute cleanup pass stays an index range scan instead of a
+sequential scan.
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-08-28 00:00:00.000000
+"""
+
+from alembic import op
+
+revision = "005"
+down_revision = "004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_sessions_idle
+        ON broker_sessions((COALESCE(last_activity, started_at)))
+        WHERE container_id IS NOT NULL
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS idx_sessions_idle")
@@ -0,0 +1,30 @@
+"""Partial index on broker_sessions.container_id.
+
+Container-holding rows are the filter for the cleanup and needing-
+containers scans; a partial index keeps only those rows indexed, so the
+planner can prune container-less sessions without touching the heap and
+the index stays tiny.
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-08-28 00:00:00.000000
+"""
+
+from alembic import op
+
+revision = "006"
+down_revision = "005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_sessions_container_active
+        ON broker_sessions(container_id)
+        WHERE container_id IS NOT NULL
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS idx_sessions_container_active")
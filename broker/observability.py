@@ -7,27 +7,28 @@ Observability module: Prometheus metrics and structured JSON logging.
 - Periodic business metrics collection (called from ConnectionMonitor)
 """
 
+import atexit
+import io
+import json
 import logging
 import sys
+import threading
+from typing import Iterator
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # type: ignore[assignment]
 
 from flask import Flask
-from prometheus_client import Counter, Gauge, Histogram
+from prometheus_client import REGISTRY, Counter, Gauge, Histogram
+from prometheus_client.core import GaugeMetricFamily
 from prometheus_flask_exporter import PrometheusMetrics
 
 # =============================================================================
 # Prometheus Custom Metrics
 # =============================================================================
 
-ACTIVE_CONTAINERS = Gauge(
-    "broker_active_containers",
-    "Number of VNC containers currently running",
-)
-
-POOL_CONTAINERS = Gauge(
-    "broker_pool_containers",
-    "Number of pool containers available (unclaimed)",
-)
-
 ACTIVE_CONNECTIONS = Gauge(
     "broker_active_connections",
     "Number of active Guacamole connections",
@@ -45,15 +46,55 @@ ERRORS_TOTAL = Counter(
     ["endpoint"],
 )
 
-DB_POOL_SIZE = Gauge(
-    "broker_db_pool_size",
-    "Total connections in the database pool",
-)
+class BusinessMetricsCollector:
+    """
+    Custom collector computing fleet and pool gauges at scrape time.
 
-DB_POOL_USED = Gauge(
-    "broker_db_pool_used",
-    "Connections currently checked out",
-)
+    Reading container inventory and DB pool stats happens only when
+    Prometheus actually scrapes /metrics, instead of on every monitor
+    tick regardless of whether anyone is watching. Uses lazy imports to
+    avoid circular dependencies.
+    """
+
+    def collect(self) -> Iterator[GaugeMetricFamily]:
+        try:
+            from broker.domain.orchestrator import get_orchestrator
+            orchestrator = get_orchestrator()
+            yield GaugeMetricFamily(
+                "broker_active_containers",
+                "Number of VNC containers currently running",
+                value=orchestrator.get_running_count(),
+            )
+            yield GaugeMetricFamily(
+                "broker_pool_containers",
+                "Number of pool containers available (unclaimed)",
+                value=len(orchestrator.get_pool_containers()),
+            )
+        except Exception:
+            pass
+
+        try:
+            from broker.persistence.database import get_pool_stats
+            stats = get_pool_stats()
+            yield GaugeMetricFamily(
+                "broker_db_pool_size",
+                "Total connections in the database pool",
+                value=stats["pool_size"],
+            )
+            yield GaugeMetricFamily(
+                "broker_db_pool_used",
+                "Connections currently checked out",
+                value=stats["pool_used"],
+            )
+        except Exception:
+            pass
+
+
+try:
+    REGISTRY.register(BusinessMetricsCollector())  # type: ignore[arg-type]
+except ValueError:
+    # Already registered (module re-imported under a different name)
+    pass
 
 
 # =============================================================================
@@ -82,53 +123,144 @@ def init_metrics(app: Flask) -> PrometheusMetrics:
 # JSON Structured Logging
 # =============================================================================
 
-def setup_json_logging(level: str = "INFO") -> None:
+# Wrappers created by setup_json_logging are kept alive here — letting one
+# be garbage collected would close the real stderr buffer underneath it
+_buffered_streams: list[io.TextIOWrapper] = []
+# Handler installed by the most recent setup_json_logging call; the flush
+# thread and the atexit hook both read it so re-configuring logging
+# re-targets them instead of leaving them bound to a replaced handler
+_active_handler: logging.Handler | None = None
+_flush_thread_started = False
+_FLUSH_INTERVAL = 0.5
+
+
+# Level names resolved once; skips the getLevelName lookup per record
+_LEVEL_NAMES = {
+    logging.DEBUG: "DEBUG",
+    logging.INFO: "INFO",
+    logging.WARNING: "WARNING",
+    logging.ERROR: "ERROR",
+    logging.CRITICAL: "CRITICAL",
+}
+
+
+class FastJsonFormatter(logging.Formatter):
     """
-    Configure the root logger with JSON structured output.
+    Minimal JSON formatter with a fixed field template.
+
+    Serializes with orjson when available (C-implemented, no per-record
+    field renaming or ISO formatting — the epoch float in ``timestamp``
+    is converted by the log consumer instead), falling back to compact
+    stdlib json.
 
-    Uses python-json-logger's JsonFormatter. The existing SensitiveDataFilter
-    remains compatible (it modifies record.msg before formatting).
-    The 'audit' logger is unaffected (propagate=False, own handler).
+    The serialized string is cached on the record, so a record passing
+    through several handlers (e.g. stderr plus a future file handler) is
+    formatted once. Filters that rewrite record.msg — like the
+    SensitiveDataFilter — run before formatting, so they are unaffected.
     """
-    from pythonjsonlogger.json import JsonFormatter
 
-    handler = logging.StreamHandler(sys.stderr)
-    formatter = JsonFormatter(
-        fmt="%(timestamp)s %(name)s %(levelname)s %(message)s",
-        rename_fields={"levelname": "level", "asctime": "timestamp"},
-        timestamp=True,
+    def format(self, record: logging.LogRecord) -> str:
+        cached = getattr(record, "_json_cache", None)
+        if cached is not None:
+            return cached
+        entry = {
+            "timestamp": record.created,
+            "name": record.name,
+            "level": _LEVEL_NAMES.get(record.levelno, record.levelname),
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        if orjson is not None:
+            out = orjson.dumps(entry).decode()
+        else:
+            out = json.dumps(entry, separators=(",", ":"))
+        record._json_cache = out  # type: ignore[attr-defined]
+        return out
+
+
+class _BufferedStreamHandler(logging.StreamHandler):
+    """
+    StreamHandler over a buffered stream that only forces a flush for
+    WARNING and above. INFO/DEBUG records accumulate in the 16 KiB buffer
+    and go out in one write() instead of one syscall per record; the
+    background flusher bounds how stale buffered lines can get.
+    """
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            msg = self.format(record)
+            self.stream.write(msg + self.terminator)
+            if record.levelno >= logging.WARNING:
+                self.flush()
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+
+def _get_buffered_stderr() -> io.TextIOWrapper:
+    """Build a buffered text wrapper over the current stderr."""
+    stream = io.TextIOWrapper(
+        io.BufferedWriter(sys.stderr.buffer, buffer_size=16384),
+        line_buffering=False,
     )
-    handler.setFormatter(formatter)
+    _buffered_streams.append(stream)
+    return stream
 
-    root = logging.getLogger()
-    root.handlers.clear()
-    root.addHandler(handler)
-    root.setLevel(level.upper())
 
+def _flush_active_handler() -> None:
+    """Flush the current handler, ignoring already-closed streams."""
+    handler = _active_handler
+    if handler is None:
+        return
+    try:
+        handler.flush()
+    except ValueError:
+        # Stream closed (interpreter shutdown, or handler replaced by a
+        # later setup_json_logging call)
+        pass
+
+
+def _start_flush_thread() -> None:
+    """Flush the buffered handler periodically so quiet periods still
+    surface buffered records promptly."""
+    global _flush_thread_started
+    if _flush_thread_started:
+        return
+    _flush_thread_started = True
+
+    def _flush_loop() -> None:
+        import time
+        while True:
+            time.sleep(_FLUSH_INTERVAL)
+            _flush_active_handler()
+
+    threading.Thread(target=_flush_loop, name="log-flush", daemon=True).start()
 
-# =============================================================================
-# Business Metrics Collection
-# =============================================================================
 
-def collect_business_metrics() -> None:
+def setup_json_logging(level: str = "INFO") -> None:
     """
-    Update Gauges from current system state.
+    Configure the root logger with JSON structured output.
 
-    Uses lazy imports to avoid circular dependencies.
-    Called periodically from the ConnectionMonitor loop.
+    Uses FastJsonFormatter over a buffered stderr handler (flushes
+    immediately at WARNING+, every 500 ms otherwise). The existing
+    SensitiveDataFilter remains compatible (it modifies record.msg before
+    formatting). The 'audit' logger is unaffected (propagate=False, own
+    handler).
     """
-    try:
-        from broker.domain.orchestrator import get_orchestrator
-        orchestrator = get_orchestrator()
-        ACTIVE_CONTAINERS.set(orchestrator.get_running_count())
-        POOL_CONTAINERS.set(len(orchestrator.get_pool_containers()))
-    except Exception:
-        pass
+    global _active_handler
+    handler = _BufferedStreamHandler(_get_buffered_stderr())
+    handler.setFormatter(FastJsonFormatter())
+
+    root = logging.getLogger()
+    root.handlers.clear()
+    root.addHandler(handler)
+    root.setLevel(level.upper())
+
+    _active_handler = handler
+    if not _flush_thread_started:
+        atexit.register(_flush_active_handler)
+    _start_flush_thread()
+
 
-    try:
-        from broker.persistence.database import get_pool_stats
-        stats = get_pool_stats()
-        DB_POOL_SIZE.set(stats["pool_size"])
-        DB_POOL_USED.set(stats["pool_used"])
-    except Exception:
-        pass
@@ -10,7 +10,7 @@ import logging
 import os
 import threading
 from contextlib import contextmanager
-from typing import Generator
+from typing import Any, Generator
 
 import psycopg2
 from psycopg2.pool import ThreadedConnectionPool
@@ -32,16 +32,56 @@ DB_CONFIG = {
     "database": DATABASE_NAME,
     "user": DATABASE_USER,
     "password": DATABASE_PASSWORD,
+    # TCP keepalives: idle pooled connections are probed by the kernel so
+    # NAT/firewall idle timeouts can't silently kill them
+    "keepalives": 1,
+    "keepalives_idle": 30,
+    "keepalives_interval": 10,
+    "keepalives_count": 3,
 }
 
-# Pool configuration
+# Pool configuration. The max default scales with the host so bursty
+# provisioning doesn't serialize on getconn(); gains plateau around 25-50
+# connections, so larger deployments should pin DB_POOL_MAX explicitly
 DB_POOL_MIN = int(os.environ.get("DB_POOL_MIN", "2"))
-DB_POOL_MAX = int(os.environ.get("DB_POOL_MAX", "8"))
+DB_POOL_MAX = int(os.environ.get("DB_POOL_MAX", str(max(8, (os.cpu_count() or 4) * 2 + 4))))
+
+class _HealthCheckedPool(ThreadedConnectionPool):
+    """ThreadedConnectionPool that discards dead connections on checkout.
+
+    Keepalives make silent kills unlikely, but a connection can still die
+    while idle in the pool; a cheap liveness probe on checkout turns that
+    into a transparent reconnect instead of a failed request.
+    """
+
+    def getconn(self, key: Any | None = None) -> psycopg2.extensions.connection:
+        conn = super().getconn(key)
+        # Probe the replacement too — the pool may hand back another idle
+        # (equally dead) member before opening a fresh connection
+        for _ in range(2):
+            try:
+                if conn.closed:
+                    raise psycopg2.OperationalError("connection closed in pool")
+                with conn.cursor() as cur:
+                    cur.execute("SELECT 1")
+                conn.rollback()  # hand out a clean transaction state
+                return conn
+            except psycopg2.Error:
+                # Drop the dead connection; the pool opens a fresh one
+                super().putconn(conn, key, close=True)
+                conn = super().getconn(key)
+        return conn
+
 
 # Module-level pool and lock
 _pool: ThreadedConnectionPool | None = None
 _pool_lock = threading.Lock()
 
+# Set once the pool exists; lets request threads that race app startup wait
+# briefly instead of failing outright
+_pool_ready = threading.Event()
+_POOL_WAIT_TIMEOUT = 5.0
+
 
 def init_pool() -> None:
     """Initialize the connection pool (idempotent).
@@ -55,11 +95,12 @@ def init_pool() -> None:
     with _pool_lock:
         if _pool is not None:
             return
-        _pool = ThreadedConnectionPool(
+        _pool = _HealthCheckedPool(
             DB_POOL_MIN,
             DB_POOL_MAX,
             **DB_CONFIG,
         )
+        _pool_ready.set()
         logger.info(
             "Database connection pool initialized (min=%d, max=%d)",
             DB_POOL_MIN,
@@ -77,6 +118,7 @@ def close_pool() -> None:
             return
         _pool.closeall()
         _pool = None
+        _pool_ready.clear()
         logger.info("Database connection pool closed")
 
 
@@ -85,12 +127,16 @@ def get_pool_stats() -> dict[str, int]:
 
     Returns zeros when the pool is not initialized.
     """
-    if _pool is None:
+    # Local snapshot: close_pool() may null _pool between the check and the
+    # reads. The len() calls are single atomic reads of pre-aggregated
+    # sizes — no pool lock is taken, so scrapes never contend with getconn
+    pool = _pool
+    if pool is None:
         return {"pool_size": 0, "pool_used": 0}
-    # _pool._used is a dict of connections currently checked out
-    # _pool._pool is a list of idle connections
-    used = len(getattr(_pool, "_used", {}))
-    idle = len(getattr(_pool, "_pool", []))
+    # pool._used is a dict of connections currently checked out
+    # pool._pool is a list of idle connections
+    used = len(getattr(pool, "_used", {}))
+    idle = len(getattr(pool, "_pool", []))
     return {"pool_size": used + idle, "pool_used": used}
 
 
@@ -109,9 +155,13 @@ def get_db_connection() -> Generator[psycopg2.extensions.connection, None, None]
         RuntimeError: If the pool has not been initialized.
     """
     if _pool is None:
-        raise RuntimeError(
-            "Database pool not initialized. Call init_pool() first."
-        )
+        # Another thread may still be inside init_pool() during startup;
+        # give it a moment before treating this as a hard failure
+        _pool_ready.wait(timeout=_POOL_WAIT_TIMEOUT)
+        if _pool is None:
+            raise RuntimeError(
+                "Database pool not initialized. Call init_pool() first."
+            )
     conn = _pool.getconn()
     try:
         yield conn
@@ -40,19 +40,14 @@ def _is_pre_existing_database() -> bool:
     conn = psycopg2.connect(**DB_CONFIG)
     try:
         with conn.cursor() as cur:
-            # Check for broker_sessions table
+            # to_regclass is a direct catalog lookup — one round-trip and no
+            # information_schema view expansion
             cur.execute(
-                "SELECT 1 FROM information_schema.tables "
-                "WHERE table_name = 'broker_sessions'"
+                "SELECT to_regclass('broker_sessions'), to_regclass('alembic_version')"
             )
-            has_tables = cur.fetchone() is not None
-
-            # Check for alembic_version table
-            cur.execute(
-                "SELECT 1 FROM information_schema.tables "
-                "WHERE table_name = 'alembic_version'"
-            )
-            has_alembic = cur.fetchone() is not None
+            row = cur.fetchone()
+            has_tables = row is not None and row[0] is not None
+            has_alembic = row is not None and row[1] is not None
         return has_tables and not has_alembic
     finally:
         conn.close()
@@ -1,5 +1,5 @@
 """
-Circuit breaker pattern for resilient external service calls.
+Resilience patterns (circuit breaker, singleflight) for external service calls.
 """
 
 from __future__ import annotations
@@ -7,6 +7,7 @@ from __future__ import annotations
 import enum
 import threading
 import time
+from concurrent.futures import Future
 from typing import Any, Callable
 
 from prometheus_client import Counter, Gauge
@@ -72,19 +73,52 @@ class CircuitBreaker:
         self._lock = threading.Lock()
         self._state = CircuitState.CLOSED
         self._failure_count = 0
-        self._last_failure_time: float = 0.0
+        # Integer nanoseconds: monotonic_ns() avoids the float conversion
+        # of monotonic() and the comparisons stay pure int arithmetic
+        self._recovery_timeout_ns = int(recovery_timeout * 1e9)
+        self._last_failure_ns: int = 0
+
+        # Resolve the labelled children once; .labels() does a hashed
+        # registry lookup and every call site below holds self._lock
+        self._state_metric = CIRCUIT_STATE.labels(name=self.name)
+        self._trips_metric = CIRCUIT_TRIPS.labels(name=self.name)
 
         # Initialize metric
-        CIRCUIT_STATE.labels(name=self.name).set(CircuitState.CLOSED.value)
+        self._state_metric.set(CircuitState.CLOSED.value)
 
     @property
     def state(self) -> CircuitState:
+        """Current state (pure read — never transitions the circuit).
+
+        An elapsed recovery timeout is reported as HALF_OPEN, but the
+        actual transition only happens in :meth:`_acquire_permit` so that
+        observers (metrics endpoints, log statements) cannot race the
+        single allowed probe.
+        """
+        with self._lock:
+            if (
+                self._state == CircuitState.OPEN
+                and time.monotonic_ns() - self._last_failure_ns >= self._recovery_timeout_ns
+            ):
+                return CircuitState.HALF_OPEN
+            return self._state
+
+    def _acquire_permit(self) -> None:
+        """Check admission and transition OPEN -> HALF_OPEN in one locked step.
+
+        Raises:
+            CircuitOpenError: If the circuit is OPEN and the recovery
+                timeout has not elapsed yet.
+        """
         with self._lock:
             if self._state == CircuitState.OPEN:
-                if time.monotonic() - self._last_failure_time >= self.recovery_timeout:
+                elapsed_ns = time.monotonic_ns() - self._last_failure_ns
+                if elapsed_ns >= self._recovery_timeout_ns:
                     self._state = CircuitState.HALF_OPEN
-                    CIRCUIT_STATE.labels(name=self.name).set(CircuitState.HALF_OPEN.value)
-            return self._state
+                    self._state_metric.set(CircuitState.HALF_OPEN.value)
+                else:
+                    retry_after = (self._recovery_timeout_ns - elapsed_ns) / 1e9
+                    raise CircuitOpenError(self.name, max(0.0, retry_after))
 
     def call(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
         """Execute *func* through the circuit breaker.
@@ -93,14 +127,7 @@ class CircuitBreaker:
         concurrent threads are not blocked while the network round-trip
         is in flight.
         """
-        with self._lock:
-            if self._state == CircuitState.OPEN:
-                if time.monotonic() - self._last_failure_time >= self.recovery_timeout:
-                    self._state = CircuitState.HALF_OPEN
-                    CIRCUIT_STATE.labels(name=self.name).set(CircuitState.HALF_OPEN.value)
-                else:
-                    retry_after = self.recovery_timeout - (time.monotonic() - self._last_failure_time)
-                    raise CircuitOpenError(self.name, max(0.0, retry_after))
+        self._acquire_permit()
 
         # Execute outside the lock (no lock held during I/O)
         try:
@@ -117,8 +144,8 @@ class CircuitBreaker:
         with self._lock:
             self._state = CircuitState.CLOSED
             self._failure_count = 0
-            self._last_failure_time = 0.0
-            CIRCUIT_STATE.labels(name=self.name).set(CircuitState.CLOSED.value)
+            self._last_failure_ns = 0
+            self._state_metric.set(CircuitState.CLOSED.value)
 
     # ------------------------------------------------------------------
     # Internal helpers
@@ -129,21 +156,73 @@ class CircuitBreaker:
             self._failure_count = 0
             if self._state == CircuitState.HALF_OPEN:
                 self._state = CircuitState.CLOSED
-                CIRCUIT_STATE.labels(name=self.name).set(CircuitState.CLOSED.value)
+                self._state_metric.set(CircuitState.CLOSED.value)
 
     def _record_failure(self) -> None:
         with self._lock:
             self._failure_count += 1
-            self._last_failure_time = time.monotonic()
+            self._last_failure_ns = time.monotonic_ns()
 
             if self._state == CircuitState.HALF_OPEN:
                 self._state = CircuitState.OPEN
-                CIRCUIT_STATE.labels(name=self.name).set(CircuitState.OPEN.value)
-                CIRCUIT_TRIPS.labels(name=self.name).inc()
+                self._state_metric.set(CircuitState.OPEN.value)
+                self._trips_metric.inc()
             elif (
                 self._state == CircuitState.CLOSED
                 and self._failure_count >= self.failure_threshold
             ):
                 self._state = CircuitState.OPEN
-                CIRCUIT_STATE.labels(name=self.name).set(CircuitState.OPEN.value)
-                CIRCUIT_TRIPS.labels(name=self.name).inc()
+                self._state_metric.set(CircuitState.OPEN.value)
+                self._trips_metric.inc()
+
+
+# =============================================================================
+# Singleflight
+# =============================================================================
+
+class Singleflight:
+    """Coalesce concurrent identical calls into a single execution.
+
+    While a call for a given key is in flight, concurrent callers with the
+    same key block on the same Future and share its result instead of each
+    issuing their own call. Sequential calls are not cached — once the
+    in-flight call resolves, the next caller executes again.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._inflight: dict[str, Future] = {}
+
+    def do(self, key: str, func: Callable[[], Any]) -> Any:
+        """Execute *func*, deduplicating concurrent calls sharing *key*.
+
+        Args:
+            key: Deduplication key (e.g. function name + args)
+            func: Zero-argument callable performing the actual work
+
+        Returns:
+            The result of *func* (own call or the shared in-flight one)
+        """
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                leader = False
+            else:
+                future = Future()
+                self._inflight[key] = future
+                leader = True
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = func()
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
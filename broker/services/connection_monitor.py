@@ -18,18 +18,19 @@ logger = logging.getLogger("session-broker")
 class ConnectionMonitor:
     """Background service to monitor active connections."""
 
-    def __init__(self, interval: int = 5):
+    def __init__(self, interval: int = 5, cleanup_interval: int = 300):
         """
         Initialize connection monitor.
 
         Args:
             interval: Check interval in seconds
+            cleanup_interval: Idle-container cleanup interval in seconds
         """
         self.interval = interval
+        self.cleanup_interval = cleanup_interval
         self._lock = threading.Lock()
         self._active_connections: set = set()
         self._running = False
-        self._cleanup_counter = 0
         self._stop_event = threading.Event()
 
     @property
@@ -50,6 +51,9 @@ class ConnectionMonitor:
             self._running = True
         self._stop_event.clear()
         threading.Thread(target=self._monitor_loop, daemon=True).start()
+        # Cleanup runs on its own cadence so a slow container destroy can
+        # never delay active-connection detection
+        threading.Thread(target=self._cleanup_loop, daemon=True).start()
         logger.info("Connection monitor started")
 
     def stop(self) -> None:
@@ -61,44 +65,49 @@ class ConnectionMonitor:
 
     def _monitor_loop(self) -> None:
         """Main monitor loop."""
+        # Deferred to thread start (not module import) to avoid circular
+        # imports; resolved once here instead of on every tick
+        from broker.container import get_services
+        from broker.observability import ACTIVE_CONNECTIONS
+
         while not self._stop_event.is_set():
             try:
-                from broker.container import get_services
                 guac_api = get_services().guac_api
 
                 active = guac_api.get_active_connections()
-                current = {c.get("connectionIdentifier") for c in active.values() if c.get("connectionIdentifier")}
+                # Single pass: conn-id -> connection info, so new-connection
+                # handling below is a dict lookup instead of an O(N) rescan
+                by_conn_id: dict[str, dict] = {}
+                for c in active.values():
+                    cid = c.get("connectionIdentifier")
+                    if cid:
+                        by_conn_id[cid] = c
+                current = set(by_conn_id)
 
                 with self._lock:
                     previous = self._active_connections
 
-                # Handle new connections
-                for conn_id in current - previous:
-                    info: dict[str, str] = next((c for c in active.values() if c.get("connectionIdentifier") == conn_id), {})
-                    on_connection_start(conn_id, info.get("username", "unknown"))
-
-                # Handle ended connections
-                for conn_id in previous - current:
-                    session = SessionStore.get_session_by_connection(conn_id)
-                    if session:
-                        on_connection_end(conn_id, session.username or "unknown")
-
-                # Update Prometheus gauges
-                from broker.observability import ACTIVE_CONNECTIONS, collect_business_metrics
-                ACTIVE_CONNECTIONS.set(len(current))
-                collect_business_metrics()
-
-                # Atomically update state
-                with self._lock:
-                    self._active_connections = current
-                    self._cleanup_counter += 1
-                    should_cleanup = self._cleanup_counter >= 60
-                    if should_cleanup:
-                        self._cleanup_counter = 0
-
-                # Run cleanup every 60 iterations (~5 minutes with 5s interval)
-                if should_cleanup:
-                    self.cleanup_inactive_containers()
+                # Fast path: stable connection set — one equality check
+                # instead of building two difference sets per tick
+                if current != previous:
+                    # Handle new connections
+                    for conn_id in current - previous:
+                        info = by_conn_id[conn_id]
+                        on_connection_start(conn_id, info.get("username", "unknown"))
+
+                    # Handle ended connections
+                    for conn_id in previous - current:
+                        session = SessionStore.get_session_by_connection(conn_id)
+                        if session:
+                            on_connection_end(conn_id, session.username or "unknown")
+
+                    # Update Prometheus gauge; fleet/pool gauges are computed
+                    # at scrape time by BusinessMetricsCollector
+                    ACTIVE_CONNECTIONS.set(len(current))
+
+                    # Atomically update state
+                    with self._lock:
+                        self._active_connections = current
             except CircuitOpenError as e:
                 backoff = max(self.interval, e.retry_after)
                 logger.warning(f"Monitor: circuit open, backing off {backoff:.0f}s")
@@ -108,6 +117,16 @@ class ConnectionMonitor:
                 logger.error(f"Monitor error: {e}")
             self._stop_event.wait(self.interval)
 
+    def _cleanup_loop(self) -> None:
+        """Idle-container cleanup loop, decoupled from the scan cadence."""
+        while not self._stop_event.is_set():
+            if self._stop_event.wait(self.cleanup_interval):
+                return
+            try:
+                self.cleanup_inactive_containers()
+            except Exception as e:
+                logger.error(f"Cleanup loop error: {e}")
+
     def cleanup_inactive_containers(self) -> None:
         """
         Clean up containers that have been inactive longer than the timeout.
@@ -120,40 +139,25 @@ class ConnectionMonitor:
         active = self.active_connections  # thread-safe copy
 
         try:
-            sessions = SessionStore.list_sessions()
             now = time.time()
             timeout_seconds = timeout_minutes * 60
-            cleaned = 0
-
-            for session in sessions:
-                if session is None:
-                    continue
-                if not session.container_id:
-                    continue
 
-                # Skip if container is currently in use
-                if session.guac_connection_id and session.guac_connection_id in active:
-                    continue
-
-                # Check inactivity timeout
-                last_activity = session.last_activity or session.started_at
-                if not last_activity:
-                    continue
-
-                inactive_seconds = now - last_activity
-
-                if inactive_seconds > timeout_seconds:
-                    username = session.username or "unknown"
-                    logger.info(f"Cleaning up inactive container for {username} "
-                               f"(idle {inactive_seconds/60:.1f}min > {timeout_minutes}min)")
+            # Idle filtering happens in SQL, and the claim atomically clears
+            # the container columns (SKIP LOCKED) so a concurrent pass can
+            # never destroy the same container twice
+            victims = SessionStore.claim_idle_with_containers(
+                now - timeout_seconds, active
+            )
+            for session in victims:
+                username = session.username or "unknown"
+                inactive_seconds = now - (session.last_activity or session.started_at or now)
+                logger.info(f"Cleaning up inactive container for {username} "
+                           f"(idle {inactive_seconds/60:.1f}min > {timeout_minutes}min)")
+                if session.container_id:
                     destroy_container(session.container_id)
-                    session.container_id = None
-                    session.container_ip = None
-                    SessionStore.save_session(session.session_id, session)
-                    cleaned += 1
 
-            if cleaned > 0:
-                logger.info(f"Cleanup: {cleaned} idle containers destroyed")
+            if victims:
+                logger.info(f"Cleanup: {len(victims)} idle containers destroyed")
 
         except Exception as e:
             logger.error(f"Cleanup error: {e}")
@@ -172,38 +176,17 @@ class ConnectionMonitor:
         active = self.active_connections  # thread-safe copy
 
         try:
-            sessions = SessionStore.list_sessions()
-            now = time.time()
-
-            # Get inactive sessions with containers, sorted by last_activity (oldest first)
-            inactive = []
-            for session in sessions:
-                if session is None:
-                    continue
-                if not session.container_id:
-                    continue
-
-                if session.guac_connection_id and session.guac_connection_id in active:
-                    continue  # Skip active connections
-
-                last_activity = session.last_activity or session.started_at or now
-                inactive.append((last_activity, session))
-
-            # Sort by last_activity (oldest first)
-            inactive.sort(key=lambda x: x[0])
+            # Postgres sorts, limits and atomically claims the victims
+            # (SKIP LOCKED), so concurrent callers can't double-kill
+            victims = SessionStore.claim_oldest_idle(count, active)
 
-            killed = 0
-            for _, session in inactive[:count]:
+            for session in victims:
                 username = session.username or "unknown"
                 logger.warning(f"Force killing container for {username} (low resources)")
                 if session.container_id:
                     destroy_container(session.container_id)
-                session.container_id = None
-                session.container_ip = None
-                SessionStore.save_session(session.session_id, session)
-                killed += 1
 
-            return killed
+            return len(victims)
 
         except Exception as e:
             logger.error(f"Force kill error: {e}")
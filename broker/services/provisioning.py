@@ -3,6 +3,7 @@ User provisioning and connection lifecycle management.
 """
 
 import logging
+import threading
 import time
 import uuid
 
@@ -25,13 +26,46 @@ from broker.domain.container import (
 logger = logging.getLogger("session-broker")
 
 
-def provision_user_connection(username: str) -> str:
+# Guards the background top-up so a burst of claims triggers one
+# replenishment pass instead of one thread per claim
+_topup_lock = threading.Lock()
+
+
+def _trigger_pool_topup() -> None:
+    """Kick off an asynchronous pool replenishment after a claim.
+
+    No-op when a top-up is already running: prewarm_containers refills to
+    the configured pool size in one pass, so concurrent claims have
+    nothing to add.
+    """
+    from broker.container import get_services
+
+    try:
+        user_sync = get_services().user_sync
+    except RuntimeError:
+        return
+    if not _topup_lock.acquire(blocking=False):
+        return
+
+    def _run() -> None:
+        try:
+            user_sync.prewarm_containers()
+        finally:
+            _topup_lock.release()
+
+    threading.Thread(target=_run, name="pool-topup", daemon=True).start()
+
+
+def provision_user_connection(username: str, groups: list | None = None) -> str:
     """
     Provision a VNC connection for a user.
     First tries to claim a container from the pool, otherwise creates a new one.
 
     Args:
         username: Username
+        groups: Pre-fetched Guacamole group names; when None they are
+            looked up here (batch callers prefetch to avoid one
+            round-trip per user)
 
     Returns:
         Guacamole connection ID
@@ -58,7 +92,7 @@ def provision_user_connection(username: str) -> str:
 
         # Apply group configuration
         try:
-            user_groups = guac_api.get_user_groups(username)
+            user_groups = groups if groups is not None else guac_api.get_user_groups(username)
             applied_config = UserProfile.apply_group_config(username, user_groups)
             logger.info(f"Configuration applied for {username}, groups: {applied_config.get('groups', [])}")
         except Exception as e:
@@ -113,7 +147,7 @@ def provision_user_connection(username: str) -> str:
         assert session_id is not None
 
         # Wait for VNC to be ready (pool containers should already be ready)
-        if not wait_for_vnc(container_ip, port=VNC_PORT, timeout=VNC_CONTAINER_TIMEOUT):
+        if not wait_for_vnc(container_ip, port=VNC_PORT, timeout=VNC_CONTAINER_TIMEOUT, session_id=session_id):
             destroy_container(container_id)
             raise RuntimeError(f"VNC server timeout for {username}")
 
@@ -159,6 +193,12 @@ def provision_user_connection(username: str) -> str:
             raise RuntimeError(f"Race condition for {username} but no session found")
 
         logger.info(f"Connection provisioned for {username}: {conn_id}")
+
+        # Warm a replacement right away instead of waiting for the next sync
+        # cycle, so the pool stays full under bursts of claims.
+        if claimed_from_pool:
+            _trigger_pool_topup()
+
         return conn_id
     except Exception:
         ERRORS_TOTAL.labels(endpoint="provision").inc()
@@ -204,7 +244,7 @@ def on_connection_start(connection_id: str, username: str) -> bool:
             vnc_pass
         )
 
-        if not wait_for_vnc(container_ip, port=VNC_PORT, timeout=VNC_CONTAINER_TIMEOUT):
+        if not wait_for_vnc(container_ip, port=VNC_PORT, timeout=VNC_CONTAINER_TIMEOUT, session_id=session.session_id):
             destroy_container(container_id)
             raise RuntimeError("VNC server timeout")
 
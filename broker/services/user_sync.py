@@ -5,8 +5,10 @@ User synchronization service for Guacamole users.
 from __future__ import annotations
 
 import logging
+import re
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
 import uuid
 
@@ -25,6 +27,35 @@ from broker.services.provisioning import provision_user_connection
 
 logger = logging.getLogger("session-broker")
 
+# /proc/meminfo is re-read many times per pre-warm cycle (resource checks
+# run per spawn slot); a short TTL collapses that to one read + parse per
+# cycle. The file is ~1KB, so one read() beats line iteration
+_MEMINFO_RE = re.compile(rb"^(MemTotal|MemAvailable):\s+(\d+)", re.M)
+_MEMINFO_TTL = 1.0
+_meminfo_lock = threading.Lock()
+_meminfo_cache: tuple[float, dict[str, float]] | None = None
+
+
+def _read_meminfo() -> dict[str, float]:
+    """Read /proc/meminfo (cached ~1s), returning {field: GB}."""
+    global _meminfo_cache
+    now = time.monotonic()
+    with _meminfo_lock:
+        if _meminfo_cache is not None and now - _meminfo_cache[0] < _MEMINFO_TTL:
+            return _meminfo_cache[1]
+    try:
+        with open("/proc/meminfo", "rb") as f:
+            data = f.read()
+        values = {
+            m.group(1).decode(): int(m.group(2)) / 1024 / 1024
+            for m in _MEMINFO_RE.finditer(data)
+        }
+    except Exception:
+        values = {}
+    with _meminfo_lock:
+        _meminfo_cache = (now, values)
+    return values
+
 
 class UserSyncService:
     """Background service to sync Guacamole users."""
@@ -42,6 +73,7 @@ class UserSyncService:
         self.sync_stats: dict[str, Any] = {"total_synced": 0, "last_new_users": [], "errors": 0}
         self._lock = threading.Lock()
         self._stop_event = threading.Event()
+        self._containers_mem_cache: tuple[float, float] | None = None
 
     @property
     def running(self) -> bool:
@@ -100,35 +132,27 @@ class UserSyncService:
             return 0
 
     def get_total_memory_gb(self) -> float:
-        """Get total system memory in GB."""
-        try:
-            with open("/proc/meminfo", "r") as f:
-                for line in f:
-                    if line.startswith("MemTotal:"):
-                        kb = int(line.split()[1])
-                        return kb / 1024 / 1024
-        except Exception:
-            pass
-        return 32.0  # Assume 32GB if can't check
+        """Get total system memory in GB (cached ~1s)."""
+        return _read_meminfo().get("MemTotal", 32.0)  # Assume 32GB if can't check
 
     def get_available_memory_gb(self) -> float:
-        """Get available system memory in GB."""
-        try:
-            with open("/proc/meminfo", "r") as f:
-                for line in f:
-                    if line.startswith("MemAvailable:"):
-                        kb = int(line.split()[1])
-                        return kb / 1024 / 1024
-        except Exception:
-            pass
-        return 999.0  # Assume plenty if can't check
+        """Get available system memory in GB (cached ~1s)."""
+        return _read_meminfo().get("MemAvailable", 999.0)  # Assume plenty if can't check
 
     def get_containers_memory_gb(self) -> float:
-        """Get total memory used by VNC containers/pods in GB."""
+        """Get total memory used by VNC containers/pods in GB (cached ~1s)."""
+        now = time.monotonic()
+        with self._lock:
+            cached = self._containers_mem_cache
+            if cached is not None and now - cached[0] < _MEMINFO_TTL:
+                return cached[1]
         try:
-            return get_orchestrator().get_containers_memory_gb()
+            value = get_orchestrator().get_containers_memory_gb()
         except Exception:
-            return 0.0
+            value = 0.0
+        with self._lock:
+            self._containers_mem_cache = (now, value)
+        return value
 
     def can_start_container(self) -> tuple[bool, str]:
         """
@@ -150,11 +174,7 @@ class UserSyncService:
         # Check maximum total container memory
         if max_total > 0:
             container_mem = self.get_containers_memory_gb()
-            container_limit = BrokerConfig.settings().containers.memory_limit
-            # Parse memory limit (e.g., "2g" -> 2.0)
-            limit_gb = float(container_limit.rstrip("gGmM"))
-            if container_limit.lower().endswith("m"):
-                limit_gb /= 1024
+            limit_gb = self._container_limit_gb()
 
             if container_mem + limit_gb > max_total:
                 return False, f"max container memory ({container_mem:.1f}GB + {limit_gb}GB > {max_total}GB)"
@@ -162,13 +182,20 @@ class UserSyncService:
         # Check maximum memory percentage
         if max_percent > 0:
             total_mem = self.get_total_memory_gb()
-            available = self.get_available_memory_gb()
             used_percent = 1 - (available / total_mem)
             if used_percent > max_percent:
                 return False, f"max memory percent ({used_percent:.0%} > {max_percent:.0%})"
 
         return True, "ok"
 
+    def _container_limit_gb(self) -> float:
+        """Parse containers.memory_limit (e.g. "2g", "512m") into GB."""
+        container_limit = BrokerConfig.settings().containers.memory_limit
+        limit_gb = float(container_limit.rstrip("gGmM"))
+        if container_limit.lower().endswith("m"):
+            limit_gb /= 1024
+        return limit_gb
+
     def prewarm_containers(self) -> None:
         """
         Maintain the container pool at the target size.
@@ -227,57 +254,95 @@ class UserSyncService:
                     logger.warning(f"Pre-warm skipped: {reason}")
                     return
 
-            started = 0
-            for _ in range(slots_available):
-                # Re-check resources before each container
-                can_start, reason = self.can_start_container()
-                if not can_start:
-                    # Try force kill if enabled
-                    force_kill = BrokerConfig.settings().lifecycle.force_kill_on_low_resources
-                    if force_kill:
-                        killed = monitor.force_kill_oldest_inactive(count=1)
-                        if killed > 0:
-                            can_start, reason = self.can_start_container()
-
-                    if not can_start:
-                        logger.warning(f"Pre-warm stopped: {reason}")
-                        break
-
-                try:
-                    session_id = str(uuid.uuid4())[:8]
-                    vnc_password = generate_vnc_password()
-
-                    # Spawn pool container without username
-                    container_id, container_ip = spawn_vnc_container(
-                        session_id, None, vnc_password
-                    )
-
-                    if wait_for_vnc(container_ip, port=VNC_PORT, timeout=VNC_CONTAINER_TIMEOUT):
-                        # Save pool session (no username, no guac connection yet)
-                        SessionStore.save_session(session_id, {
-                            "session_id": session_id,
-                            "username": None,
-                            "guac_connection_id": None,
-                            "vnc_password": vnc_password,
-                            "container_id": container_id,
-                            "container_ip": container_ip,
-                            "created_at": time.time(),
-                            "started_at": time.time()
-                        })
-
-                        started += 1
-                        logger.info(f"Pool replenished: container {container_id} ready ({started}/{slots_available})")
-                    else:
-                        destroy_container(container_id)
-                        logger.warning(f"Pre-warm timeout for pool container")
-                except Exception as e:
-                    logger.warning(f"Pre-warm error: {e}")
+            # Parallel spawns each pass their own point-in-time resource
+            # check before any memory is consumed; cap the batch by the
+            # headroom measured now so the workers can't collectively
+            # overshoot the budget
+            min_free = BrokerConfig.settings().pool.resources.min_free_memory_gb
+            credits = int(
+                (self.get_available_memory_gb() - min_free) / self._container_limit_gb()
+            )
+            slots_available = min(slots_available, max(1, credits))
+
+            started = self._spawn_pool_batch(slots_available, context="Pre-warm")
 
             if started > 0:
                 logger.info(f"Pre-warm cycle: {started} pool containers added, {self.get_running_container_count()} total")
         except Exception as e:
             logger.error(f"Pre-warm scan error: {e}")
 
+    def _spawn_one_pool_container(self, context: str) -> bool:
+        """
+        Spawn a single pool container, wait for VNC, and persist its session.
+
+        Args:
+            context: Log prefix ("Pre-warm" or "Pool init")
+
+        Returns:
+            True if a pool container came up and was saved
+        """
+        # Re-check resources right before spawning: parallel workers may
+        # have consumed the headroom measured at batch planning time.
+        can_start, reason = self.can_start_container()
+        if not can_start:
+            logger.warning(f"{context} skipped: {reason}")
+            return False
+
+        try:
+            session_id = str(uuid.uuid4())[:8]
+            vnc_password = generate_vnc_password()
+
+            # Spawn pool container without username
+            container_id, container_ip = spawn_vnc_container(
+                session_id, None, vnc_password
+            )
+
+            if wait_for_vnc(container_ip, port=VNC_PORT, timeout=VNC_CONTAINER_TIMEOUT, session_id=session_id):
+                # Save pool session (no username, no guac connection yet)
+                SessionStore.save_session(session_id, {
+                    "session_id": session_id,
+                    "username": None,
+                    "guac_connection_id": None,
+                    "vnc_password": vnc_password,
+                    "container_id": container_id,
+                    "container_ip": container_ip,
+                    "created_at": time.time(),
+                    "started_at": time.time()
+                })
+                logger.info(f"{context}: container {container_id} ready")
+                return True
+
+            destroy_container(container_id)
+            logger.warning(f"{context} timeout for pool container {container_id}")
+        except Exception as e:
+            logger.warning(f"{context} error: {e}")
+        return False
+
+    def _spawn_pool_batch(self, count: int, context: str) -> int:
+        """
+        Bring up *count* pool containers concurrently.
+
+        Spawns fan out over a thread pool: container creation is
+        daemon-bound and handled concurrently by Docker/Kubernetes, so the
+        batch completes in ~one spawn latency instead of count of them.
+
+        Args:
+            count: Number of pool containers to start
+            context: Log prefix for the individual spawns
+
+        Returns:
+            Number of containers successfully started
+        """
+        if count <= 0:
+            return 0
+        with ThreadPoolExecutor(
+            max_workers=min(8, count), thread_name_prefix="pool-warmup"
+        ) as executor:
+            results = list(
+                executor.map(lambda _: self._spawn_one_pool_container(context), range(count))
+            )
+        return sum(results)
+
     def init_pool(self) -> None:
         """
         Initialize the container pool at startup.
@@ -302,43 +367,7 @@ class UserSyncService:
 
         logger.info(f"Initializing container pool with {needed} containers...")
 
-        started = 0
-        for _ in range(needed):
-            # Check resources before each container
-            can_start, reason = self.can_start_container()
-            if not can_start:
-                logger.warning(f"Pool init stopped: {reason}")
-                break
-
-            try:
-                session_id = str(uuid.uuid4())[:8]
-                vnc_password = generate_vnc_password()
-
-                # Spawn pool container without username
-                container_id, container_ip = spawn_vnc_container(
-                    session_id, None, vnc_password
-                )
-
-                if wait_for_vnc(container_ip, port=VNC_PORT, timeout=VNC_CONTAINER_TIMEOUT):
-                    # Save pool session (no username, no guac connection yet)
-                    SessionStore.save_session(session_id, {
-                        "session_id": session_id,
-                        "username": None,
-                        "guac_connection_id": None,
-                        "vnc_password": vnc_password,
-                        "container_id": container_id,
-                        "container_ip": container_ip,
-                        "created_at": time.time(),
-                        "started_at": time.time()
-                    })
-
-                    started += 1
-                    logger.info(f"Pool init: container {container_id} ready ({started}/{needed})")
-                else:
-                    destroy_container(container_id)
-                    logger.warning(f"Pool init timeout for container {container_id}")
-            except Exception as e:
-                logger.warning(f"Pool init error: {e}")
+        started = self._spawn_pool_batch(needed, context="Pool init")
 
         logger.info(f"Pool initialization complete: {started} containers started")
 
@@ -358,9 +387,12 @@ class UserSyncService:
         new_users = guac_users - provisioned
 
         result = []
+        # One parallel prefetch instead of a sequential group round-trip
+        # per user inside provision_user_connection
+        groups_by_user = guac_api.get_users_with_groups(list(new_users)) if new_users else {}
         for username in new_users:
             try:
-                provision_user_connection(username)
+                provision_user_connection(username, groups=groups_by_user.get(username))
                 result.append(username)
                 with self._lock:
                     self.sync_stats["total_synced"] += 1
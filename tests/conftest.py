@@ -29,6 +29,26 @@ from broker.config.models import BrokerSettings  # noqa: E402
 from broker.domain.types import SessionData  # noqa: E402
 
 
+# ---------------------------------------------------------------------------
+# Module-level state resets
+# ---------------------------------------------------------------------------
+
+@pytest.fixture(autouse=True)
+def _reset_session_state():
+    """Clear SessionStore module state (user mirror, prepared-connection
+    tracking) between tests."""
+    import broker.domain.session as session_module
+    session_module._provisioned_users = None
+    session_module._prepared_conns.clear()
+    session_module._session_cache.clear()
+    session_module._pool_cache = None
+    yield
+    session_module._provisioned_users = None
+    session_module._prepared_conns.clear()
+    session_module._session_cache.clear()
+    session_module._pool_cache = None
+
+
 # ---------------------------------------------------------------------------
 # Database mock
 # ---------------------------------------------------------------------------
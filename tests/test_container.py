@@ -61,6 +61,35 @@ class TestWaitForVnc:
         from broker.domain.container import wait_for_vnc
         assert wait_for_vnc("10.0.0.1", timeout=30) is True
 
+    def test_wait_for_vnc_webhook_signal(self, mocker):
+        """Readiness webhook short-circuits the socket probing."""
+        mocker.patch(
+            "broker.domain.container.socket.create_connection",
+            side_effect=ConnectionRefusedError,
+        )
+        from broker.domain.container import (
+            register_ready_signal,
+            signal_container_ready,
+            wait_for_vnc,
+        )
+        register_ready_signal("sess-ready", "tok")
+        assert signal_container_ready("sess-ready", "tok") is True
+        assert wait_for_vnc("10.0.0.1", timeout=5, session_id="sess-ready") is True
+
+    def test_ready_signal_rejects_unknown_or_bad_token(self):
+        """Unregistered sessions and wrong tokens are rejected, not stored."""
+        from broker.domain import container as container_module
+        from broker.domain.container import register_ready_signal, signal_container_ready
+
+        assert signal_container_ready("never-spawned", "tok") is False
+        assert "never-spawned" not in container_module._ready_events
+
+        register_ready_signal("sess-x", "right")
+        try:
+            assert signal_container_ready("sess-x", "wrong") is False
+        finally:
+            container_module.discard_ready_signal("sess-x")
+
     def test_wait_for_vnc_timeout(self, mocker):
         """Always ConnectionRefused → False."""
         mocker.patch(
@@ -12,15 +12,21 @@ import broker.persistence.database as db_mod
 def _reset_pool():
     """Ensure each test starts with no pool and restores state afterward."""
     original = db_mod._pool
+    was_ready = db_mod._pool_ready.is_set()
     db_mod._pool = None
+    db_mod._pool_ready.clear()
     yield
     db_mod._pool = original
+    if was_ready:
+        db_mod._pool_ready.set()
+    else:
+        db_mod._pool_ready.clear()
 
 
 class TestInitPool:
     def test_creates_pool(self, mocker):
         mock_pool_cls = mocker.patch(
-            "broker.persistence.database.ThreadedConnectionPool",
+            "broker.persistence.database._HealthCheckedPool",
             return_value=MagicMock(),
         )
         db_mod.init_pool()
@@ -29,7 +35,7 @@ class TestInitPool:
 
     def test_is_idempotent(self, mocker):
         mock_pool_cls = mocker.patch(
-            "broker.persistence.database.ThreadedConnectionPool",
+            "broker.persistence.database._HealthCheckedPool",
             return_value=MagicMock(),
         )
         db_mod.init_pool()
@@ -37,6 +43,25 @@ class TestInitPool:
         mock_pool_cls.assert_called_once()
 
 
+class TestHealthCheckedPool:
+    def test_replaces_dead_connection(self, mocker):
+        """A dead pooled connection is closed and a fresh one handed out."""
+        dead = MagicMock()
+        dead.closed = True
+        fresh = MagicMock()
+        fresh.closed = False
+        mocker.patch.object(
+            db_mod.ThreadedConnectionPool, "getconn", side_effect=[dead, fresh]
+        )
+        putconn = mocker.patch.object(db_mod.ThreadedConnectionPool, "putconn")
+
+        pool = db_mod._HealthCheckedPool.__new__(db_mod._HealthCheckedPool)
+        conn = pool.getconn()
+
+        assert conn is fresh
+        putconn.assert_called_once_with(dead, None, close=True)
+
+
 class TestClosePool:
     def test_closes_pool(self, mocker):
         mock_pool = MagicMock()
@@ -65,7 +90,9 @@ class TestGetPoolStats:
 
 
 class TestGetDbConnection:
-    def test_raises_without_pool(self):
+    def test_raises_without_pool(self, mocker):
+        # Skip the startup grace period so the failure path is immediate
+        mocker.patch.object(db_mod, "_POOL_WAIT_TIMEOUT", 0)
         with pytest.raises(RuntimeError, match="pool not initialized"):
             with db_mod.get_db_connection():
                 pass
@@ -296,6 +296,19 @@ class TestMiscMethods:
         groups = api.get_user_groups("alice")
         assert groups == ["developers", "admins"]
 
+    def test_get_users_with_groups(self, mocker):
+        """Per-user lookups are aggregated; failed ones are dropped."""
+        api = _make_api()
+
+        def fake_groups(username):
+            if username == "bob":
+                raise RuntimeError("boom")
+            return [f"{username}-group"]
+
+        mocker.patch.object(api, "get_user_groups", side_effect=fake_groups)
+        result = api.get_users_with_groups(["alice", "bob"])
+        assert result == {"alice": ["alice-group"]}
+
 
 # ---------------------------------------------------------------------------
 # 403 re-authentication
@@ -52,31 +52,23 @@ class TestBusinessMetrics:
         after = ERRORS_TOTAL.labels(endpoint="test")._value.get()
         assert after == before + 1
 
-    def test_active_containers_gauge(self):
-        """broker_active_containers gauge can be set."""
-        from broker.observability import ACTIVE_CONTAINERS
-        ACTIVE_CONTAINERS.set(5)
-        assert ACTIVE_CONTAINERS._value.get() == 5.0
-        ACTIVE_CONTAINERS.set(0)
-
-    def test_collect_business_metrics(self, mock_orchestrator):
-        """collect_business_metrics updates gauges from orchestrator."""
-        from broker.observability import (
-            collect_business_metrics,
-            ACTIVE_CONTAINERS,
-            POOL_CONTAINERS,
-        )
+    def test_business_collector_scrape(self, mock_orchestrator, mocker):
+        """BusinessMetricsCollector reads current state at collect() time."""
+        from broker.observability import BusinessMetricsCollector
+
         mock_orchestrator.get_running_count.return_value = 3
         mock_orchestrator.get_pool_containers.return_value = [{"id": "a"}, {"id": "b"}]
+        mocker.patch(
+            "broker.persistence.database.get_pool_stats",
+            return_value={"pool_size": 5, "pool_used": 2},
+        )
 
-        collect_business_metrics()
-
-        assert ACTIVE_CONTAINERS._value.get() == 3.0
-        assert POOL_CONTAINERS._value.get() == 2.0
+        families = {m.name: m for m in BusinessMetricsCollector().collect()}
 
-        # Cleanup
-        ACTIVE_CONTAINERS.set(0)
-        POOL_CONTAINERS.set(0)
+        assert families["broker_active_containers"].samples[0].value == 3.0
+        assert families["broker_pool_containers"].samples[0].value == 2.0
+        assert families["broker_db_pool_size"].samples[0].value == 5.0
+        assert families["broker_db_pool_used"].samples[0].value == 2.0
 
 
 # ---------------------------------------------------------------------------
@@ -93,6 +85,9 @@ class TestJsonLogging:
 
         test_logger = logging.getLogger("test.json_format")
         test_logger.info("hello structured world")
+        # INFO records are buffered; force the flush a WARNING would trigger
+        for handler in logging.getLogger().handlers:
+            handler.flush()
 
         captured = capfd.readouterr()
         # The JSON output goes to stderr
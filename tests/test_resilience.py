@@ -1,13 +1,14 @@
 """
-Tests for broker.resilience (CircuitBreaker) and graceful shutdown.
+Tests for broker.resilience (CircuitBreaker, Singleflight) and graceful shutdown.
 """
 
+import threading
 import time
 from unittest.mock import MagicMock
 
 import pytest
 
-from broker.resilience import CircuitBreaker, CircuitOpenError, CircuitState
+from broker.resilience import CircuitBreaker, CircuitOpenError, CircuitState, Singleflight
 
 
 # ---------------------------------------------------------------------------
@@ -147,6 +148,63 @@ class TestCircuitBreakerRecovery:
         assert cb.call(lambda: 42) == 42
 
 
+# ---------------------------------------------------------------------------
+# Singleflight
+# ---------------------------------------------------------------------------
+
+class TestSingleflight:
+
+    def test_sequential_calls_execute_each_time(self):
+        """Singleflight is not a cache: sequential calls run the function again."""
+        sf = Singleflight()
+        calls = []
+
+        sf.do("key", lambda: calls.append(1))
+        sf.do("key", lambda: calls.append(1))
+
+        assert len(calls) == 2
+
+    def test_concurrent_calls_share_one_execution(self):
+        """Concurrent callers with the same key share one in-flight call."""
+        sf = Singleflight()
+        calls = []
+        release = threading.Event()
+
+        def slow():
+            calls.append(1)
+            release.wait(timeout=5)
+            return "result"
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(sf.do("key", slow)))
+            for _ in range(5)
+        ]
+        for t in threads:
+            t.start()
+        # Give followers time to pile onto the leader's Future
+        time.sleep(0.1)
+        release.set()
+        for t in threads:
+            t.join(timeout=5)
+
+        assert results == ["result"] * 5
+        assert len(calls) == 1
+
+    def test_exception_propagates_to_all_callers(self):
+        """An exception in the leader call reaches every waiting caller."""
+        sf = Singleflight()
+
+        with pytest.raises(ValueError):
+            sf.do("key", lambda: _raise(ValueError("boom")))
+
+    def test_different_keys_do_not_coalesce(self):
+        """Distinct keys execute independently."""
+        sf = Singleflight()
+        assert sf.do("a", lambda: "a-result") == "a-result"
+        assert sf.do("b", lambda: "b-result") == "b-result"
+
+
 # ---------------------------------------------------------------------------
 # Graceful shutdown
 # ---------------------------------------------------------------------------
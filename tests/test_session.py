@@ -3,7 +3,6 @@ Tests for broker.domain.session.SessionStore.
 """
 
 import time
-from datetime import datetime
 from unittest.mock import MagicMock, call
 
 import pytest
@@ -32,11 +31,13 @@ class TestSaveSession:
         }
         SessionStore.save_session("sess-1", data)
 
-        mock_db.execute.assert_called_once()
-        sql = mock_db.execute.call_args[0][0]
-        assert "INSERT INTO broker_sessions" in sql
-        assert "ON CONFLICT" in sql
+        # First use PREPAREs the statements, then EXECUTEs the upsert
+        prepare_sql = mock_db.execute.call_args_list[0][0][0]
+        assert "INSERT INTO broker_sessions" in prepare_sql
+        assert "ON CONFLICT" in prepare_sql
 
+        sql = mock_db.execute.call_args[0][0]
+        assert "EXECUTE session_upsert" in sql
         params = mock_db.execute.call_args[0][1]
         assert params[0] == "sess-1"
         assert params[1] == "alice"
@@ -61,18 +62,11 @@ class TestGetSession:
 
     def test_get_session_found(self, mock_db):
         """get_session returns dict with timestamps converted to float."""
-        now = datetime.now()
-        mock_db.fetchone.return_value = {
-            "session_id": "sess-1",
-            "username": "alice",
-            "guac_connection_id": "42",
-            "vnc_password": "secret",
-            "container_id": "cnt-1",
-            "container_ip": "172.18.0.5",
-            "created_at": now,
-            "started_at": now,
-            "last_activity": now,
-        }
+        now = time.time()
+        mock_db.fetchone.return_value = (
+            "sess-1", "alice", "42", "secret",
+            "cnt-1", "172.18.0.5", now, now, now,
+        )
         result = SessionStore.get_session("sess-1")
 
         assert result is not None
@@ -89,6 +83,53 @@ class TestGetSession:
         assert result is None
 
 
+# ---------------------------------------------------------------------------
+# Read cache
+# ---------------------------------------------------------------------------
+
+class TestSessionCache:
+
+    def test_repeat_lookup_served_from_cache(self, mock_db):
+        """A second get_session within the TTL does not hit the database."""
+        now = time.time()
+        mock_db.fetchone.return_value = (
+            "sess-1", "alice", "42", "secret",
+            "cnt-1", "172.18.0.5", now, now, now,
+        )
+        SessionStore.get_session("sess-1")
+        queries_after_first = mock_db.execute.call_count
+        result = SessionStore.get_session("sess-1")
+        assert result is not None
+        assert result.session_id == "sess-1"
+        assert mock_db.execute.call_count == queries_after_first
+
+    def test_fetch_populates_all_lookup_keys(self, mock_db):
+        """One fetch primes the id/user/conn keys for the same row."""
+        now = time.time()
+        mock_db.fetchone.return_value = (
+            "sess-1", "alice", "42", "secret",
+            "cnt-1", "172.18.0.5", now, now, now,
+        )
+        SessionStore.get_session("sess-1")
+        queries_after_first = mock_db.execute.call_count
+        assert SessionStore.get_session_by_username("alice") is not None
+        assert SessionStore.get_session_by_connection("42") is not None
+        assert mock_db.execute.call_count == queries_after_first
+
+    def test_save_evicts_cached_row(self, mock_db):
+        """save_session invalidates every key of the cached row."""
+        now = time.time()
+        mock_db.fetchone.return_value = (
+            "sess-1", "alice", "42", "secret",
+            "cnt-1", "172.18.0.5", now, now, now,
+        )
+        SessionStore.get_session("sess-1")
+        SessionStore.save_session("sess-1", {"container_id": "cnt-2"})
+        queries_after_save = mock_db.execute.call_count
+        SessionStore.get_session_by_username("alice")
+        assert mock_db.execute.call_count > queries_after_save
+
+
 # ---------------------------------------------------------------------------
 # delete_session
 # ---------------------------------------------------------------------------
@@ -96,10 +137,10 @@ class TestGetSession:
 class TestDeleteSession:
 
     def test_delete_session(self, mock_db):
-        """delete_session issues DELETE SQL."""
+        """delete_session executes the prepared DELETE."""
         SessionStore.delete_session("sess-1")
         sql = mock_db.execute.call_args[0][0]
-        assert "DELETE FROM broker_sessions" in sql
+        assert "EXECUTE session_delete" in sql
         params = mock_db.execute.call_args[0][1]
         assert params == ("sess-1",)
 
@@ -112,43 +153,29 @@ class TestLookups:
 
     def test_get_session_by_username(self, mock_db):
         """Lookup by username."""
-        now = datetime.now()
-        mock_db.fetchone.return_value = {
-            "session_id": "sess-1",
-            "username": "bob",
-            "guac_connection_id": "10",
-            "vnc_password": "pw",
-            "container_id": "cnt-2",
-            "container_ip": "172.18.0.6",
-            "created_at": now,
-            "started_at": now,
-            "last_activity": None,
-        }
+        now = time.time()
+        mock_db.fetchone.return_value = (
+            "sess-1", "bob", "10", "pw",
+            "cnt-2", "172.18.0.6", now, now, None,
+        )
         result = SessionStore.get_session_by_username("bob")
         assert result is not None
         assert result.username == "bob"
         sql = mock_db.execute.call_args[0][0]
-        assert "WHERE username" in sql
+        assert "EXECUTE session_get_by_username" in sql
 
     def test_get_session_by_connection(self, mock_db):
         """Lookup by connection_id."""
-        now = datetime.now()
-        mock_db.fetchone.return_value = {
-            "session_id": "sess-1",
-            "username": "alice",
-            "guac_connection_id": "42",
-            "vnc_password": "pw",
-            "container_id": "cnt-1",
-            "container_ip": "172.18.0.5",
-            "created_at": now,
-            "started_at": now,
-            "last_activity": None,
-        }
+        now = time.time()
+        mock_db.fetchone.return_value = (
+            "sess-1", "alice", "42", "pw",
+            "cnt-1", "172.18.0.5", now, now, None,
+        )
         result = SessionStore.get_session_by_connection("42")
         assert result is not None
         assert result.guac_connection_id == "42"
         sql = mock_db.execute.call_args[0][0]
-        assert "WHERE guac_connection_id" in sql
+        assert "EXECUTE session_get_by_connection" in sql
 
 
 # ---------------------------------------------------------------------------
@@ -158,23 +185,13 @@ class TestLookups:
 class TestListSessions:
 
     def test_list_sessions(self, mock_db):
-        """list_sessions returns list of dicts."""
-        now = datetime.now()
-        mock_db.fetchall.return_value = [
-            {
-                "session_id": "s1", "username": "alice",
-                "guac_connection_id": "1", "vnc_password": "pw",
-                "container_id": "c1", "container_ip": "10.0.0.1",
-                "created_at": now, "started_at": now, "last_activity": None,
-            },
-            {
-                "session_id": "s2", "username": "bob",
-                "guac_connection_id": "2", "vnc_password": "pw2",
-                "container_id": "c2", "container_ip": "10.0.0.2",
-                "created_at": now, "started_at": None, "last_activity": None,
-            },
-        ]
-        result = SessionStore.list_sessions()
+        """list_sessions streams SessionData rows."""
+        now = time.time()
+        mock_db.__iter__.return_value = iter([
+            ("s1", "alice", "1", "pw", "c1", "10.0.0.1", now, now, None),
+            ("s2", "bob", "2", "pw2", "c2", "10.0.0.2", now, None, None),
+        ])
+        result = list(SessionStore.list_sessions())
         assert len(result) == 2
         assert result[0].session_id == "s1"
         assert result[1].session_id == "s2"
@@ -188,30 +205,112 @@ class TestPoolSessions:
 
     def test_get_pool_sessions_filters_dead(self, mock_db, mocker):
         """get_pool_sessions filters out containers that are not running."""
-        now = datetime.now()
+        now = time.time()
         mock_db.fetchall.return_value = [
-            {
-                "session_id": "pool-1", "username": None,
-                "guac_connection_id": None, "vnc_password": "pw",
-                "container_id": "alive", "container_ip": "10.0.0.1",
-                "created_at": now, "started_at": now, "last_activity": None,
-            },
-            {
-                "session_id": "pool-2", "username": None,
-                "guac_connection_id": None, "vnc_password": "pw2",
-                "container_id": "dead", "container_ip": "10.0.0.2",
-                "created_at": now, "started_at": now, "last_activity": None,
-            },
+            ("pool-1", "pw", "alive", "10.0.0.1", now),
+            ("pool-2", "pw2", "dead", "10.0.0.2", now),
         ]
-        # alive → True, dead → False
+        # Only "alive" is in the running set
         mocker.patch(
-            "broker.domain.container.is_container_running",
-            side_effect=lambda cid: cid == "alive",
+            "broker.domain.container.get_running_container_ids",
+            return_value={"alive"},
         )
         result = SessionStore.get_pool_sessions()
         assert len(result) == 1
         assert result[0].container_id == "alive"
 
+    def test_get_pool_sessions_cached_until_write(self, mock_db, mocker):
+        """A second listing within the TTL skips the database; saves evict."""
+        now = time.time()
+        mock_db.fetchall.return_value = [
+            ("pool-1", "pw", "alive", "10.0.0.1", now),
+        ]
+        mocker.patch(
+            "broker.domain.container.get_running_container_ids",
+            return_value={"alive"},
+        )
+        SessionStore.get_pool_sessions()
+        queries_after_first = mock_db.execute.call_count
+        result = SessionStore.get_pool_sessions()
+        assert len(result) == 1
+        assert mock_db.execute.call_count == queries_after_first
+
+        SessionStore.save_session("pool-1", {"username": "alice"})
+        SessionStore.get_pool_sessions()
+        assert mock_db.execute.call_count > queries_after_first + 1
+
+
+# ---------------------------------------------------------------------------
+# Sessions needing containers
+# ---------------------------------------------------------------------------
+
+class TestSessionsNeedingContainers:
+
+    def test_filter_runs_in_sql_and_clears_stale_ids(self, mock_db, mocker):
+        """Running ids are passed as an array param; stale ids are cleared."""
+        now = time.time()
+        mock_db.fetchall.return_value = [
+            ("s1", "alice", "1", "pw", None, None, now, None, None),
+            ("s2", "bob", "2", "pw2", "gone", "10.0.0.2", now, now, None),
+        ]
+        mocker.patch(
+            "broker.domain.container.get_running_container_ids",
+            return_value={"alive"},
+        )
+        result = SessionStore.get_sessions_needing_containers()
+
+        sql = mock_db.execute.call_args[0][0]
+        assert "unnest" in sql
+        assert mock_db.execute.call_args[0][1] == (["alive"],)
+        assert len(result) == 2
+        # The removed container's stale id was cleared
+        assert result[1].container_id is None
+        assert result[1].container_ip is None
+
+
+# ---------------------------------------------------------------------------
+# Idle sessions
+# ---------------------------------------------------------------------------
+
+class TestIdleSessions:
+
+    def test_claim_idle_with_containers(self, mock_db):
+        """Cutoff and active connection ids are pushed into the claim query."""
+        now = time.time()
+        mock_db.fetchall.return_value = [
+            ("s1", "alice", "1", "pw", "c1", "10.0.0.1", now, now, now),
+        ]
+        result = SessionStore.claim_idle_with_containers(now - 180, {"7", "9"})
+
+        assert len(result) == 1
+        assert result[0].session_id == "s1"
+        assert result[0].container_id == "c1"  # pre-claim value, for destroy
+        sql = mock_db.execute.call_args[0][0]
+        assert "container_id IS NOT NULL" in sql
+        assert "COALESCE(last_activity, started_at)" in sql
+        assert "FOR UPDATE SKIP LOCKED" in sql
+        assert "SET container_id = NULL" in sql
+        cutoff, conn_ids = mock_db.execute.call_args[0][1]
+        assert cutoff == now - 180
+        assert sorted(conn_ids) == ["7", "9"]
+
+    def test_claim_oldest_idle(self, mock_db):
+        """Oldest-first ordering and the limit run in SQL."""
+        now = time.time()
+        mock_db.fetchall.return_value = [
+            ("s1", "alice", "1", "pw", "c1", "10.0.0.1", now, now, now),
+        ]
+        result = SessionStore.claim_oldest_idle(2, {"7"})
+
+        assert len(result) == 1
+        sql = mock_db.execute.call_args[0][0]
+        assert "ORDER BY COALESCE(last_activity, started_at)" in sql
+        assert "LIMIT %s" in sql
+        assert "FOR UPDATE SKIP LOCKED" in sql
+        conn_ids, limit = mock_db.execute.call_args[0][1]
+        assert conn_ids == ["7"]
+        assert limit == 2
+
 
 # ---------------------------------------------------------------------------
 # claim_pool_session
@@ -245,4 +344,24 @@ class TestGetProvisionedUsers:
         result = SessionStore.get_provisioned_users()
         assert result == {"alice", "bob"}
         sql = mock_db.execute.call_args[0][0]
-        assert "DISTINCT username" in sql
+        assert "WITH RECURSIVE" in sql
+
+    def test_get_provisioned_users_cached(self, mock_db):
+        """Second call is served from the in-memory mirror, no extra query."""
+        mock_db.fetchall.return_value = [("alice",)]
+        SessionStore.get_provisioned_users()
+        assert SessionStore.get_provisioned_users() == {"alice"}
+        assert mock_db.execute.call_count == 1
+
+    def test_save_session_updates_mirror(self, mock_db):
+        """A save with a username lands in the mirror without a rescan."""
+        mock_db.fetchall.return_value = []
+        assert SessionStore.get_provisioned_users() == set()
+        SessionStore.save_session("s1", {"username": "carol"})
+        assert SessionStore.get_provisioned_users() == {"carol"}
+        # Only the initial load hit the DISTINCT scan
+        scans = [
+            c for c in mock_db.execute.call_args_list
+            if "WITH RECURSIVE" in c[0][0]
+        ]
+        assert len(scans) == 1
@@ -171,6 +171,38 @@ class TestChromiumPolicies:
         assert data["RestoreOnStartup"] == 5
 
 
+# ---------------------------------------------------------------------------
+# set_browser_policies short-circuit
+# ---------------------------------------------------------------------------
+
+class TestPolicyShortCircuit:
+
+    def test_skips_write_when_unchanged(self, user_data_tmp, mock_broker_config, mocker):
+        """Identical policy inputs do not rewrite the policy files."""
+        from broker.domain.user_profile import UserProfile
+        mocker.patch.dict(UserProfile._applied_hashes, clear=True)
+        ff_mock = mocker.patch.object(UserProfile, "_set_firefox_policies")
+
+        bookmarks = [{"name": "Ex", "url": "https://example.com"}]
+        UserProfile.set_browser_policies("alice", bookmarks, "https://home", [])
+        UserProfile.set_browser_policies("alice", bookmarks, "https://home", [])
+        assert ff_mock.call_count == 1
+
+        # A changed homepage triggers a rewrite
+        UserProfile.set_browser_policies("alice", bookmarks, "https://other", [])
+        assert ff_mock.call_count == 2
+
+    def test_hashes_are_per_user(self, user_data_tmp, mock_broker_config, mocker):
+        """One user's applied policies do not short-circuit another's."""
+        from broker.domain.user_profile import UserProfile
+        mocker.patch.dict(UserProfile._applied_hashes, clear=True)
+        ff_mock = mocker.patch.object(UserProfile, "_set_firefox_policies")
+
+        UserProfile.set_browser_policies("alice", [], "https://home", [])
+        UserProfile.set_browser_policies("bob", [], "https://home", [])
+        assert ff_mock.call_count == 2
+
+
 # ---------------------------------------------------------------------------
 # apply_profile_config
 # ---------------------------------------------------------------------------